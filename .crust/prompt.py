@@ -1,7 +1,7 @@
 import os
 import sys
-import subprocess
 import base
+import git_prompt
 
 def main():
     """
@@ -13,21 +13,10 @@ def main():
     if venv_name == " usr":
         venv_name = ""
 
-    git_info = ""
-    try:
-        # Check if in a git repo and get repo/branch info
-        git_dir = subprocess.run(['git', 'rev-parse', '--show-toplevel'], capture_output=True, text=True)
-        if git_dir.returncode == 0:
-            repo_path = git_dir.stdout.strip()
-            repo_name = os.path.basename(repo_path)
-            # Get branch name
-            branch = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], capture_output=True, text=True)
-            branch_name = branch.stdout.strip() if branch.returncode == 0 else '?'
-            git_info = f"[cyan] {repo_name} [/][bold green] {branch_name}[/] "
-    except Exception:
-        # Ignore git errors
-        pass
-    
+    # Repo and branch are read from .git directly; dirty/ahead/behind markers
+    # show up once git status finishes in the background
+    git_info = git_prompt.segment(show_status=True)
+
     username = os.getlogin()
     path = os.getcwd().replace("/home/" + username, " ~")
 
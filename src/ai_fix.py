@@ -0,0 +1,143 @@
+import json
+import os
+import shlex
+import time
+
+import ai_stream
+import config_find
+import sysinfo
+
+# The fix offered after a command fails: the assistant suggests a corrected command, which runs on Enter.
+# Suggestions are remembered in ~/.cache/crust/ai-fixes.json under the normalized command, its exit code
+# and the distro, together with whether the user took them. A failure seen before gets the fix that was
+# accepted last time without asking the model, and a fix the user turned down is never offered again.
+# The file keeps the MAX_ENTRIES most recently used failures.
+
+MAX_ENTRIES = 256
+# After this many turned down fixes for a failure, stop asking the model about it
+MAX_REJECTED = 3
+
+FIX_PROMPT = """Command '{command}' failed with exit code {code}.
+
+System info:
+{system}
+
+Fix this command by:
+- If package not found: install it with the right package manager (yay/paru for AUR on Arch, apt on Ubuntu, etc.)
+- If typo: fix the spelling
+- Use sudo when needed
+- Only reply with the corrected command, nothing else
+{rejected}
+Fixed command:"""
+
+# Key -> {"fixes": {fix: "offered" | "accepted" | "rejected"}, "time": last use}, least recently used first
+_entries = None
+_file = None
+
+def load():
+    global _entries, _file
+    if _entries is None:
+        _entries = {}
+        _file = path = config_find.cache_file("ai-fixes.json")
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    _entries = json.load(f)
+            except (OSError, ValueError):
+                _entries = {}
+    return _entries
+
+def save():
+    path = _file
+    if not path or _entries is None:
+        return
+    try:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(_entries, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def normalize(command):
+    """The command with its quoting and spacing made canonical, so `ls  'a'` and `ls a` share a fix."""
+    try:
+        return " ".join(shlex.quote(word) for word in shlex.split(command))
+    except ValueError:
+        return " ".join(command.split())
+
+def key(command, code):
+    return f"{normalize(command)}\0{code}\0{sysinfo.os_release().get('ID', '')}"
+
+def _use(k):
+    """Return the entry for `k`, moved to the most recently used end; created when missing."""
+    entries = load()
+    entry = entries.pop(k, None) or {"fixes": {}, "time": 0}
+    entry["time"] = time.time()
+    entries[k] = entry
+    while len(entries) > MAX_ENTRIES:
+        del entries[next(iter(entries))]
+    return entry
+
+def record(k, fix, state):
+    """Remember that `fix` was offered, accepted or rejected for the failure `k`."""
+    _use(k)["fixes"][fix] = state
+    save()
+
+def cached(k):
+    """
+    Return the cached fix for the failure `k`.
+
+    Returns:
+        tuple: (fix, rejected): the fix to offer without asking the model (the accepted one, else one
+            that was offered but not answered) or None, and the fixes the user turned down.
+    """
+    entry = load().get(k)
+    if entry is None:
+        return None, []
+    fixes = entry["fixes"]
+    rejected = [fix for fix, state in fixes.items() if state == "rejected"]
+    for wanted in ("accepted", "offered"):
+        for fix, state in fixes.items():
+            if state == wanted:
+                return fix, rejected
+    return None, rejected
+
+def ask(command, code, rejected=()):
+    """Ask the model for a fix of `command`, telling it which ones not to give. None without a client."""
+    co = ai_stream.session_client()
+    if co is None:
+        return None
+    note = "".join(f"- Do not suggest `{fix}`, the user rejected it\n" for fix in rejected)
+    response = co.chat(
+        message=FIX_PROMPT.format(command=command, code=code, system=sysinfo.describe(), rejected=note),
+        model="command-r",
+        max_tokens=50,
+        temperature=0.1,
+    )
+    return response.text.strip()
+
+def offer(command, code):
+    """
+    Offer a fix for `command`, which failed with exit code `code`, and run it on Enter.
+
+    The cache answers when it can; otherwise the model is asked, unless MAX_REJECTED fixes were already
+    turned down for this failure.
+    """
+    k = key(command, code)
+    fix, rejected = cached(k)
+    if fix is None:
+        if len(rejected) >= MAX_REJECTED:
+            return
+        fix = ask(command, code, rejected)
+        if not fix or fix in rejected:
+            return
+        record(k, fix, "offered")
+
+    print(f"(Enter) {fix} (n, Enter) cancel ", end="")
+    answer = input()
+    if answer == "":
+        record(k, fix, "accepted")
+        os.system(f"bash -c \"{fix}\"")
+    else:
+        record(k, fix, "rejected")
@@ -0,0 +1,139 @@
+import os
+import queue
+import sys
+import threading
+import time
+import types
+
+import config_manager
+
+# Streams chat responses to the terminal as they are generated, for .question, troubleshooting and
+# aur_check. The text is read on a background thread and handed out one line at a time as soon as the
+# line is complete, so callers can act on a directive (.execute-command, ...) while the rest is still
+# being generated; nothing more is printed until the caller asks for the next line.
+#
+# Setting CRUST_FAKE_AI to a file makes client() return a local fake that streams the responses in it
+# (separated by lines containing only ---) instead of calling Cohere, for trying things out offline.
+
+FAKE_DELAY = 0.02
+FAKE_CHUNK = 4
+
+class FakeClient:
+    """Streams canned responses, each request getting the next one (the last one repeats)."""
+
+    def __init__(self, path, delay=FAKE_DELAY):
+        with open(path, "r") as f:
+            text = f.read()
+        self.responses = [r.strip("\n") for r in text.split("\n---\n")]
+        self.delay = delay
+        self.requests = []
+
+    def _next(self, kwargs):
+        self.requests.append(kwargs)
+        return self.responses[min(len(self.requests), len(self.responses)) - 1]
+
+    def chat_stream(self, **kwargs):
+        text = self._next(kwargs)
+        for i in range(0, len(text), FAKE_CHUNK):
+            time.sleep(self.delay)
+            yield types.SimpleNamespace(event_type="text-generation", text=text[i:i + FAKE_CHUNK])
+
+    def chat(self, **kwargs):
+        return types.SimpleNamespace(text=self._next(kwargs))
+
+def client(key):
+    """Return a Cohere client for `key`, or the fake one when CRUST_FAKE_AI is set."""
+    fake = os.environ.get("CRUST_FAKE_AI")
+    if fake:
+        return FakeClient(fake, float(os.environ.get("CRUST_FAKE_AI_DELAY", FAKE_DELAY)))
+    import cohere
+    return cohere.Client(key)
+
+_session = {"client": None}
+
+def session_client():
+    """
+    Return the client for the API key in the .crust folder. The key is read and the client made once
+    per session.
+
+    Returns:
+        The client, or None when there is no .crust folder.
+    """
+    if _session["client"] is None:
+        configs = config_manager.folder()
+        if configs is None:
+            return None
+        with open(configs + "/cohere-api-key.txt", "r") as f:
+            _session["client"] = client(f.read().strip())
+    return _session["client"]
+
+def _chunks(co, kwargs):
+    """Yield the text of the response as it is generated."""
+    if hasattr(co, "chat_stream"):
+        events = co.chat_stream(**kwargs)
+    else:
+        # Cohere SDK 4.x
+        events = co.chat(stream=True, **kwargs)
+    for event in events:
+        if getattr(event, "event_type", None) == "text-generation":
+            yield event.text
+
+_END = object()
+
+def lines(co, echo=True, transform=None, **kwargs):
+    """
+    Send a chat request and yield the response line by line while it streams in.
+
+    Each piece of text is printed (through `transform` when given) as it arrives, up to the end of
+    the current line; the rest waits until the next line is asked for. Generation goes on in the
+    background meanwhile, so asking the user something between lines does not hold it up.
+
+    Parameters:
+        co: The Cohere (or fake) client.
+        echo (bool): Print the text.
+        transform (callable | None): Applied to each piece of text before it is printed.
+        **kwargs: Passed to the chat request (message, chat_history, ...).
+    """
+    chunks = queue.Queue()
+
+    def read():
+        try:
+            for chunk in _chunks(co, kwargs):
+                chunks.put(chunk)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_END)
+
+    threading.Thread(target=read, daemon=True, name="ai_stream").start()
+
+    pending = ""
+    at_line_start = True
+    while True:
+        chunk = chunks.get()
+        if chunk is _END:
+            break
+        if isinstance(chunk, Exception):
+            raise chunk
+        parts = chunk.split("\n")
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            if echo and (part or not last):
+                sys.stdout.write((transform(part) if transform else part) + ("" if last else "\n"))
+                sys.stdout.flush()
+                at_line_start = not last
+            if last:
+                pending += part
+            else:
+                yield pending + part
+                pending = ""
+
+    if echo and not at_line_start:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    if pending:
+        yield pending
+
+def text(co, echo=True, transform=None, **kwargs):
+    """Stream a whole response to the terminal and return its text."""
+    return "\n".join(lines(co, echo=echo, transform=transform, **kwargs))
@@ -0,0 +1,218 @@
+import importlib
+import importlib.util
+import os
+
+import config_manager
+
+# Maps command names to builtin handlers, so main.main dispatches a line with a dictionary lookup
+# instead of a chain of startswith checks. Targets can be given as "module:function" strings and are
+# imported the first time the command runs, which keeps startup free of builtin imports.
+#
+# Besides the builtins registered by main.py, commands come from plugins:
+# - .crust/plugins/<command>.py in the current .crust folder
+# - the "crust.builtins" entry point group of installed packages
+# A plugin is a module with main(args), and optionally parse_args(args), complete(words, text) and
+# rows(args, lines) for pipelines; an entry point may also point straight at a main(args) function. Registered builtins win over plugins,
+# and .crust plugins over entry points.
+
+ENTRY_POINT_GROUP = "crust.builtins"
+
+# Command name -> builtin
+_commands = {}
+# Whole lines that are builtins ("disk usage") -> builtin
+_lines = {}
+# .crust folder -> (plugins dir mtime, {command: path})
+_plugin_dirs = {}
+# Plugin path -> (mtime, builtin)
+_plugins = {}
+# Entry points are scanned once; "loaded" keeps the builtins made from the ones that ran
+_entry_points = {"scanned": False, "found": {}, "loaded": {}}
+
+def register(name, target, parser=None, completer=None, stream=None, exact=False, help=""):
+    """
+    Register a builtin command.
+
+    Parameters:
+        name (str): The command name, or the whole line when `exact` is set (e.g. "disk usage").
+        target (callable | str): handler(args) run with the words after the command, or a
+            "module:function" string imported on first use.
+        parser (callable | str | None): Turns the words into what the handler gets. Returning None
+            sends the line to bash instead, e.g. `ls` with a pipe.
+        completer (callable | str | None): completer(words, text) for the arguments, see
+            completion.register.
+        stream (callable | str | None): rows(args, lines) generator used when the command is part of
+            a pipeline; `lines` iterates over the input (None for the first command) and every
+            yielded string is one line of output. See pipeline.
+        exact (bool): Only the exact line `name` is the builtin; anything else goes to bash.
+        help (str): A one line description.
+    """
+    builtin = {
+        "name": name, "target": target, "parser": parser, "completer": completer, "stream": stream,
+        "help": help, "source": None,
+    }
+    if exact:
+        _lines[name] = builtin
+    else:
+        _commands[name] = builtin
+
+def _resolve(target):
+    """Turn a "module:function" string into the callable, importing the module."""
+    if not isinstance(target, str):
+        return target
+    module, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+def _from_module(name, module, source):
+    return {
+        "name": name,
+        "target": module.main,
+        "parser": getattr(module, "parse_args", None),
+        "completer": getattr(module, "complete", None),
+        "stream": getattr(module, "rows", None),
+        "help": (module.__doc__ or "").strip().split("\n")[0],
+        "source": source,
+    }
+
+def _plugin_paths():
+    """Return {command: path} for the plugins of the current .crust folder, re-listed when the folder changes."""
+    configs = config_manager.folder()
+    if configs is None:
+        return {}
+    directory = os.path.join(configs, "plugins")
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _plugin_dirs.get(configs)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    paths = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".py") and not entry.name.startswith("_"):
+                paths[entry.name[:-3]] = entry.path
+    _plugin_dirs[configs] = (mtime, paths)
+    return paths
+
+def _load_plugin(name, path):
+    """Import the plugin at `path`, again only when the file changed since the last time."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _plugins.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    spec = importlib.util.spec_from_file_location(f"crust_plugin_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    builtin = _from_module(name, module, path)
+    _plugins[path] = (mtime, builtin)
+    return builtin
+
+def _entry_point_commands():
+    """Return {command: entry point} for the installed packages. Scanned once; nothing is imported."""
+    if not _entry_points["scanned"]:
+        _entry_points["scanned"] = True
+        try:
+            from importlib import metadata
+            found = metadata.entry_points()
+            # Python 3.10+ has select(), 3.8 and 3.9 return a dict of groups
+            if hasattr(found, "select"):
+                group = found.select(group=ENTRY_POINT_GROUP)
+            else:
+                group = found.get(ENTRY_POINT_GROUP, ())
+            _entry_points["found"] = {ep.name: ep for ep in group}
+        except Exception:
+            _entry_points["found"] = {}
+    return _entry_points["found"]
+
+def _load_entry_point(name, entry_point):
+    builtin = _entry_points["loaded"].get(name)
+    if builtin:
+        return builtin
+    loaded = entry_point.load()
+    if callable(loaded):
+        builtin = {
+            "name": name,
+            "target": loaded,
+            "parser": None,
+            "completer": getattr(loaded, "complete", None),
+            "stream": None,
+            "help": (loaded.__doc__ or "").strip().split("\n")[0],
+            "source": entry_point.value,
+        }
+    else:
+        builtin = _from_module(name, loaded, entry_point.value)
+    _entry_points["loaded"][name] = builtin
+    return builtin
+
+def lookup(line):
+    """
+    Return (builtin, args) for `line`, or (None, None) when it is not a builtin.
+
+    Plugins are looked up only when no registered builtin matches, and imported here, the first time
+    their command is used.
+    """
+    stripped = line.strip()
+    builtin = _lines.get(stripped)
+    if builtin:
+        return builtin, []
+    words = stripped.split()
+    if not words:
+        return None, None
+    name, args = words[0], words[1:]
+
+    builtin = _commands.get(name)
+    if builtin:
+        return builtin, args
+    path = _plugin_paths().get(name)
+    if path:
+        return _load_plugin(name, path), args
+    entry_point = _entry_point_commands().get(name)
+    if entry_point is not None:
+        return _load_entry_point(name, entry_point), args
+    return None, None
+
+def arguments(builtin, args):
+    """Return what the handler of `builtin` gets for `args`: the parser's result, or None for bash."""
+    parser = _resolve(builtin["parser"])
+    return parser(args) if parser is not None else args
+
+def rows(builtin):
+    """Return the pipeline generator of `builtin`, or None when it cannot be used in a pipeline."""
+    return _resolve(builtin["stream"])
+
+def dispatch(line):
+    """
+    Run `line` if it is a builtin.
+
+    Returns:
+        bool: True when a builtin handled it, False when it should run in the shell.
+    """
+    builtin, args = lookup(line)
+    if builtin is None:
+        return False
+    args = arguments(builtin, args)
+    if args is None:
+        return False
+    _resolve(builtin["target"])(args)
+    return True
+
+def names():
+    """Return the names of every builtin and plugin command, for completion."""
+    found = set(_commands)
+    found.update(_lines)
+    found.update(_plugin_paths())
+    found.update(_entry_point_commands())
+    return sorted(found)
+
+def completer(name):
+    """Return the argument completer of the builtin or plugin `name`, or None."""
+    builtin = _commands.get(name)
+    if builtin is None:
+        path = _plugin_paths().get(name)
+        entry_point = _entry_point_commands().get(name)
+        if path:
+            builtin = _load_plugin(name, path)
+        elif entry_point is not None:
+            builtin = _load_entry_point(name, entry_point)
+    return _resolve(builtin["completer"]) if builtin else None
@@ -1,95 +1,530 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FuturesTimeout
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import base
+import config_find
+
+# Seconds a single registry may take before it is reported as timed out
+TIMEOUT = 5
+# Seconds the whole search may take; registries still pending are reported as timed out
+DEADLINE = 12
+
+# Registry URL templates. Point these at a local server to test capk offline.
+URLS = {
+    "PyPI": "https://pypi.org/pypi/{pkg}/json",
+    "AUR": "https://aur.archlinux.org/rpc/?v=5&type=info&arg[]={pkg}",
+    "APT": "https://packages.ubuntu.com/search?keywords={pkg}&searchon=names&suite=all&section=all",
+    "DNF": "https://apps.fedoraproject.org/packages/{pkg}",
+    "npm": "https://registry.npmjs.org/{pkg}",
+    "crates.io": "https://crates.io/api/v1/crates/{pkg}",
+    "Packagist": "https://repo.packagist.org/p/{pkg}.json",
+    "Homebrew": "https://formulae.brew.sh/api/formula/{pkg}.json",
+    "CPAN": "https://fastapi.metacpan.org/v1/release/{pkg}",
+    "Hackage": "https://hackage.haskell.org/package/{pkg}",
+    "Chocolatey": "https://community.chocolatey.org/packages/{pkg}",
+    "RubyGems": "https://rubygems.org/api/v1/gems/{pkg}.json",
+    "NuGet": "https://api.nuget.org/v3/registration5-semver1/{pkg}/index.json",
+}
+
+# How long cached answers stay valid, in seconds
+FOUND_TTL = 24 * 60 * 60
+NOT_FOUND_TTL = 60 * 60
+# Expired answers with an ETag or Last-Modified are kept this long for revalidation, the rest are dropped
+REVALIDATE_FOR = 7 * 24 * 60 * 60
+# Connections kept open per registry host
+POOL_SIZE = 16
+# Requests in flight at once in batch mode
+WORKERS = 16
+# Names per AUR info request in batch mode (the RPC takes many arg[] at once)
+AUR_BATCH = 100
+AUR_BULK_URL = "https://aur.archlinux.org/rpc/?v=5&type=info"
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_cache = None
+_cache_lock = threading.Lock()
+# One writer at a time: they share the temporary file name
+_save_lock = threading.Lock()
+
+def get_session(url):
+    """Return the shared requests.Session for the host of `url`, so connections to it are reused."""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
+def load_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = {}
+            path = config_find.cache_file("capk.json")
+            if path:
+                _cache = _read_cache_file(path)
+        return _cache
+
+def _read_cache_file(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _keep(entry, now):
+    age = now - entry["checked"]
+    if age < (FOUND_TTL if entry["found"] else NOT_FOUND_TTL):
+        return True
+    return age < REVALIDATE_FOR and bool(entry.get("etag") or entry.get("modified"))
+
+def save_cache():
+    """
+    Write the result cache to ~/.cache/crust/capk.json (atomically, so parallel sessions never see half
+    a file). Answers other sessions saved since the file was read are merged in, the newest answer per
+    package wins, and entries that are of no more use (see _keep) are dropped.
+    """
+    if _cache is None:
+        return
+    path = config_find.cache_file("capk.json")
+    if not path:
+        return
+    with _save_lock:
+        on_disk = _read_cache_file(path)
+        now = time.time()
+        with _cache_lock:
+            for key, entry in on_disk.items():
+                mine = _cache.get(key)
+                if mine is None or mine["checked"] < entry["checked"]:
+                    _cache[key] = entry
+            for key in [key for key, entry in _cache.items() if not _keep(entry, now)]:
+                del _cache[key]
+            data = json.dumps(_cache)
+        try:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+def _save_when_done(futures):
+    """Save the cache again once `futures`, the registries still running at the deadline, have finished."""
+    wait(futures)
+    save_cache()
+
+def cached_result(registry, pkg):
+    """Return the cached answer for `pkg` in `registry` if it has not expired yet, otherwise None."""
+    entry = load_cache().get(f"{registry}:{pkg}")
+    if entry:
+        ttl = FOUND_TTL if entry["found"] else NOT_FOUND_TTL
+        if time.time() - entry["checked"] < ttl:
+            return entry["found"]
+    return None
+
+def store_result(registry, pkg, found, etag=None, modified=None):
+    cache = load_cache()
+    with _cache_lock:
+        cache[f"{registry}:{pkg}"] = {
+            "found": found,
+            "checked": time.time(),
+            "etag": etag,
+            "modified": modified,
+        }
+
+def _check(registry, pkg, timeout, found, use_cache=True):
+    """
+    Look `pkg` up in `registry`, answering from the cache when possible.
+
+    Fresh cache entries are returned without touching the network. Stale entries that carry an
+    ETag or Last-Modified value are revalidated with a conditional request, and a 304 answer
+    keeps the cached result. Found and not-found answers expire after FOUND_TTL and NOT_FOUND_TTL.
+
+    Parameters:
+        registry (str): Key into URLS.
+        pkg (str): Package name to look up.
+        timeout (float): HTTP timeout in seconds.
+        found (callable): Called with the response, returns whether the package exists.
+        use_cache (bool): When False, always ask the registry (the answer is still stored).
+
+    Returns:
+        bool: True if the package exists in the registry.
+    """
+    if use_cache:
+        cached = cached_result(registry, pkg)
+        if cached is not None:
+            return cached
+
+    entry = load_cache().get(f"{registry}:{pkg}")
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("modified"):
+            headers["If-Modified-Since"] = entry["modified"]
+
+    name = pkg.lower() if registry == "NuGet" else pkg
+    url = URLS[registry].format(pkg=name)
+    r = get_session(url).get(url, headers=headers, timeout=timeout)
+
+    if r.status_code == 304 and entry:
+        store_result(registry, pkg, entry["found"], entry.get("etag"), entry.get("modified"))
+        return entry["found"]
+
+    result = bool(found(r))
+    store_result(registry, pkg, result, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+    return result
+
+def check_pypi(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("PyPI", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_aur(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("AUR", pkg, timeout, lambda r: r.ok and r.json().get("resultcount", 0) > 0, use_cache)
+
+def check_apt(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("APT", pkg, timeout, lambda r: f"<a href=\"/{pkg}\"" in r.text, use_cache)
+
+def check_dnf(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("DNF", pkg, timeout, lambda r: r.status_code == 200 and f">{pkg}<" in r.text, use_cache)
+
+def check_npm(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("npm", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_crates(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("crates.io", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_packagist(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("Packagist", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_homebrew(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("Homebrew", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_cpan(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("CPAN", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_hackage(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("Hackage", pkg, timeout, lambda r: r.status_code == 200 and "404" not in r.text, use_cache)
+
+def check_chocolatey(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("Chocolatey", pkg, timeout, lambda r: r.status_code == 200 and pkg.lower() in r.text.lower(), use_cache)
+
+def check_rubygems(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("RubyGems", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+def check_nuget(pkg, timeout=TIMEOUT, use_cache=True):
+    return _check("NuGet", pkg, timeout, lambda r: r.status_code == 200, use_cache)
+
+CHECKERS = {
+    "PyPI": check_pypi,
+    "AUR": check_aur,
+    "APT": check_apt,
+    "DNF": check_dnf,
+    "npm": check_npm,
+    "crates.io": check_crates,
+    "Packagist": check_packagist,
+    "Homebrew": check_homebrew,
+    "CPAN": check_cpan,
+    "Hackage": check_hackage,
+    "Chocolatey": check_chocolatey,
+    "RubyGems": check_rubygems,
+    "NuGet": check_nuget,
+}
+
+def check_all(pkg, timeout=TIMEOUT, deadline=DEADLINE, on_result=None, use_cache=True):
+    """
+    Query every registry in CHECKERS for `pkg` at the same time.
 
-def check_pypi(pkg):
-    print("[PyPI] Checking...")
-    return requests.get(f"https://pypi.org/pypi/{pkg}/json").status_code == 200
-
-def check_aur(pkg):
-    print("[AUR] Checking...")
-    r = requests.get(f"https://aur.archlinux.org/rpc/?v=5&type=info&arg[]={pkg}")
-    return r.ok and r.json().get("resultcount", 0) > 0
-
-def check_apt(pkg):
-    print("[APT] Checking...")
-    r = requests.get(f"https://packages.ubuntu.com/search?keywords={pkg}&searchon=names&suite=all&section=all")
-    return f"<a href=\"/{pkg}\"" in r.text
-
-def check_dnf(pkg):
-    print("[DNF] Checking...")
-    r = requests.get(f"https://apps.fedoraproject.org/packages/{pkg}")
-    return r.status_code == 200 and f">{pkg}<" in r.text
-
-def check_npm(pkg):
-    print("[npm] Checking...")
-    return requests.get(f"https://registry.npmjs.org/{pkg}").status_code == 200
-
-def check_crates(pkg):
-    print("[crates.io] Checking...")
-    return requests.get(f"https://crates.io/api/v1/crates/{pkg}").status_code == 200
-
-def check_packagist(pkg):
-    print("[Packagist] Checking...")
-    return requests.get(f"https://repo.packagist.org/p/{pkg}.json").status_code == 200
-
-def check_homebrew(pkg):
-    print("[Homebrew] Checking...")
-    r = requests.get(f"https://formulae.brew.sh/api/formula/{pkg}.json")
-    return r.status_code == 200
-
-def check_cpan(pkg):
-    print("[CPAN] Checking...")
-    r = requests.get(f"https://fastapi.metacpan.org/v1/release/{pkg}")
-    return r.status_code == 200
-
-def check_hackage(pkg):
-    print("[Hackage] Checking...")
-    r = requests.get(f"https://hackage.haskell.org/package/{pkg}")
-    return r.status_code == 200 and "404" not in r.text
-
-def check_chocolatey(pkg):
-    print("[Chocolatey] Checking...")
-    r = requests.get(f"https://community.chocolatey.org/packages/{pkg}")
-    return r.status_code == 200 and pkg.lower() in r.text.lower()
-
-def check_rubygems(pkg):
-    print("[RubyGems] Checking...")
-    return requests.get(f"https://rubygems.org/api/v1/gems/{pkg}.json").status_code == 200
-
-def check_nuget(pkg):
-    print("[NuGet] Checking...")
-    r = requests.get(f"https://api.nuget.org/v3/registration5-semver1/{pkg.lower()}/index.json")
-    return r.status_code == 200
-
-def check_all(pkg):
-    checkers = {
-        "PyPI": check_pypi,
-        "AUR": check_aur,
-        "APT": check_apt,
-        "DNF": check_dnf,
-        "npm": check_npm,
-        "crates.io": check_crates,
-        "Packagist": check_packagist,
-        "Homebrew": check_homebrew,
-        "CPAN": check_cpan,
-        "Hackage": check_hackage,
-        "Chocolatey": check_chocolatey,
-        "RubyGems": check_rubygems,
-        "NuGet": check_nuget,
-    }
+    Each registry runs in its own worker thread, so the total time is about the time of the slowest
+    registry rather than the sum of all of them. A registry that errors counts as not found, one that
+    exceeds `timeout` is reported as None (timed out). Registries still running when `deadline` passes
+    are reported as None as well and left to finish in the background.
 
+    Parameters:
+        pkg (str): Package name to look up.
+        timeout (float): Per-registry HTTP timeout in seconds.
+        deadline (float): Overall time budget for the whole search in seconds.
+        on_result (callable | None): Called as on_result(name, found) as soon as each registry answers.
+        use_cache (bool): When False, skip fresh cache entries and ask every registry again.
+
+    Returns:
+        dict: Registry name -> True (found), False (not found or error) or None (timed out), in CHECKERS order.
+    """
     results = {}
-    for name, func in checkers.items():
+    pool = ThreadPoolExecutor(max_workers=len(CHECKERS))
+    futures = {pool.submit(func, pkg, timeout, use_cache): name for name, func in CHECKERS.items()}
+
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            name = futures[future]
+            try:
+                found = future.result()
+            except requests.Timeout:
+                found = None
+            except Exception as e:
+                print(f"[{name}] Error: {e}")
+                found = False
+            results[name] = found
+            if on_result:
+                on_result(name, found)
+    except FuturesTimeout:
+        for future, name in futures.items():
+            if name not in results:
+                future.cancel()
+                results[name] = None
+                if on_result:
+                    on_result(name, None)
+    finally:
+        # Do not wait for stragglers past the deadline; their answers are cached when they arrive
+        pool.shutdown(wait=False)
+        save_cache()
+        late = [future for future in futures if not future.done()]
+        if late:
+            threading.Thread(target=_save_when_done, args=(late,), daemon=True, name="capk-cache").start()
+
+    return {name: results[name] for name in CHECKERS}
+
+def print_row(repo, found):
+    if found is None:
+        status = "⌛ Timed out"
+    else:
+        status = "✅ Found" if found else "❌ Not Found"
+    print(f"{repo:<12}: {status}", flush=True)
+
+def search(pkg, timeout=TIMEOUT, deadline=DEADLINE, use_cache=True):
+    print(f"\n🔍 Checking availability of '{pkg}' across package managers...\n")
+    print(f"📦 Results for '{pkg}':")
+    start = time.monotonic()
+    check_all(pkg, timeout=timeout, deadline=deadline, on_result=print_row, use_cache=use_cache)
+    print(f"\nDone in {time.monotonic() - start:.1f}s")
+
+def names_from(lines):
+    """Yield the package names in `lines`, one per line, skipping blanks, # comments and duplicates."""
+    seen = set()
+    for line in lines:
+        name = line.split("#", 1)[0].strip()
+        if name and name not in seen:
+            seen.add(name)
+            yield name
+
+def read_names(path):
+    """Read package names from `path` (or stdin for "-"), see names_from."""
+    if path == "-":
+        return list(names_from(sys.stdin.read().splitlines()))
+    with open(path, "r") as f:
+        return list(names_from(f))
+
+def _check_aur_bulk(names, timeout, use_cache):
+    """Look all `names` up in the AUR with one info request per AUR_BATCH names."""
+    results = {}
+    pending = []
+    for name in names:
+        cached = cached_result("AUR", name) if use_cache else None
+        if cached is None:
+            pending.append(name)
+        else:
+            results[name] = cached
+
+    session = get_session(AUR_BULK_URL)
+    for i in range(0, len(pending), AUR_BATCH):
+        chunk = pending[i:i + AUR_BATCH]
         try:
-            results[name] = func(pkg)
+            r = session.get(AUR_BULK_URL, params={"arg[]": chunk}, timeout=timeout)
+            r.raise_for_status()
+            existing = {result["Name"] for result in r.json().get("results", [])}
+        except requests.Timeout:
+            results.update({name: None for name in chunk})
+            continue
         except Exception as e:
-            print(f"[{name}] Error: {e}")
-            results[name] = False
+            print(f"[AUR] Error: {e}")
+            results.update({name: False for name in chunk})
+            continue
+        for name in chunk:
+            results[name] = name in existing
+            store_result("AUR", name, results[name])
     return results
 
-def search(pkg):
-    print(f"\n🔍 Checking availability of '{pkg}' across package managers...\n")
-    results = check_all(pkg)
-    print(f"\n📦 Results for '{pkg}':")
-    for repo, found in results.items():
-        status = "✅ Found" if found else "❌ Not Found"
-        print(f"{repo:<12}: {status}")
+def check_many(names, timeout=TIMEOUT, use_cache=True):
+    """
+    Check every name in `names` against every registry in CHECKERS.
+
+    The AUR is asked in bulk; every other registry gets one request per name, with at most WORKERS
+    requests in flight and at most POOL_SIZE open connections per host, so thousands of names never
+    mean thousands of connections.
+
+    Returns:
+        dict: Package name -> {registry name -> True, False or None (timed out)}.
+    """
+    matrix = {name: {} for name in names}
+    jobs = [(name, registry) for name in names for registry in CHECKERS if registry != "AUR"]
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        aur = pool.submit(_check_aur_bulk, names, timeout, use_cache)
+        futures = {pool.submit(CHECKERS[registry], name, timeout, use_cache): (name, registry) for name, registry in jobs}
+        for future in as_completed(futures):
+            name, registry = futures[future]
+            try:
+                matrix[name][registry] = future.result()
+            except requests.Timeout:
+                matrix[name][registry] = None
+            except Exception:
+                matrix[name][registry] = False
+        for name, found in aur.result().items():
+            matrix[name]["AUR"] = found
+
+    save_cache()
+    return matrix
+
+def print_matrix(matrix, registries):
+    table = base.Table(title="📦 Package Availability", show_lines=False)
+    table.add_column("Package", style="cyan", no_wrap=True)
+    for registry in registries:
+        table.add_column(registry, justify="center")
+
+    icons = {True: "✅", False: "❌", None: "⌛"}
+    for name, results in matrix.items():
+        table.add_row(name, *(icons[results.get(registry)] for registry in registries))
+    base.console.print(table)
+
+def batch(path, timeout=TIMEOUT, use_cache=True, offline=False):
+    try:
+        names = read_names(path)
+    except OSError as e:
+        print(f"capk: cannot read {path}: {e}")
+        return
+    if not names:
+        print("capk: no package names given")
+        return
+
+    if offline:
+        import capk_index
+        registries = capk_index.indexed()
+        if not registries:
+            print("No offline indexes yet, run 'capk --sync' first.")
+            return
+        matrix = {name: {registry: capk_index.lookup(registry, name) for registry in registries} for name in names}
+    else:
+        registries = list(CHECKERS)
+        print(f"🔍 Checking {len(names)} packages across {len(registries)} package managers...")
+        start = time.monotonic()
+        matrix = check_many(names, timeout=timeout, use_cache=use_cache)
+        print(f"Done in {time.monotonic() - start:.1f}s")
+
+    print_matrix(matrix, registries)
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="capk", description="Check which package registries have a package.")
+    parser.add_argument("package", nargs="?", help="package name to look up")
+    parser.add_argument("-f", "--file", help="check every package listed in FILE, one per line ('-' reads stdin)")
+    parser.add_argument("--sync", action="store_true", help="download registry name lists for offline use")
+    parser.add_argument("--offline", action="store_true", help="answer from the downloaded name lists only")
+    parser.add_argument("--no-cache", action="store_true", help="ask every registry again instead of using cached answers")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds to wait for each registry")
+    parser.add_argument("--deadline", type=float, default=DEADLINE, help="seconds to wait for the whole search")
+    return parser
+
+STATUS_WORDS = {True: "found", False: "not found", None: "timed out"}
+
+def _chunks(names, size):
+    chunk = []
+    for name in names:
+        chunk.append(name)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def rows(args, lines=None):
+    """
+    Yield results as tab separated rows for pipelines.
+
+    For one package, each row is a registry and "found", "not found" or "timed out". For many
+    (-f FILE, or names piped in), each row is a package and the registries that have it, separated
+    by commas. Names are checked AUR_BATCH at a time, so a long list streams out as it goes.
+    """
+    try:
+        opts = _parser().parse_args(args)
+    except SystemExit:
+        return
+    use_cache = not opts.no_cache
+
+    if opts.package and not opts.file:
+        if opts.offline:
+            import capk_index
+            results = {registry: capk_index.lookup(registry, opts.package) for registry in capk_index.indexed()}
+        else:
+            results = check_all(opts.package, timeout=opts.timeout, deadline=opts.deadline, use_cache=use_cache)
+        for registry, found in results.items():
+            yield f"{registry}\t{STATUS_WORDS[found]}"
+        return
+
+    if opts.file and opts.file != "-":
+        with open(opts.file, "r") as f:
+            yield from _batch_rows(opts, f)
+    elif lines is not None:
+        yield from _batch_rows(opts, lines)
+    else:
+        raise ValueError("no package names given")
+
+def _batch_rows(opts, lines):
+    if opts.offline:
+        import capk_index
+        registries = capk_index.indexed()
+    else:
+        registries = list(CHECKERS)
+    for chunk in _chunks(names_from(lines), AUR_BATCH):
+        if opts.offline:
+            matrix = {name: {registry: capk_index.lookup(registry, name) for registry in registries} for name in chunk}
+        else:
+            matrix = check_many(chunk, timeout=opts.timeout, use_cache=not opts.no_cache)
+        for name in chunk:
+            yield name + "\t" + ",".join(registry for registry in registries if matrix[name].get(registry))
+
+def main(args):
+    """
+    Entry point for the `capk` builtin.
+
+    Parameters:
+        args (list): Words after `capk` on the command line.
+    """
+    parser = _parser()
+
+    try:
+        opts = parser.parse_args(args)
+    except SystemExit:
+        # argparse already printed the usage; do not leave the shell
+        return
+
+    if opts.sync:
+        import capk_index
+        capk_index.sync()
+        if not opts.package and not opts.file:
+            return
+
+    if opts.file:
+        batch(opts.file, timeout=opts.timeout, use_cache=not opts.no_cache, offline=opts.offline)
+        return
+
+    if not opts.package:
+        parser.print_usage()
+        return
+
+    if opts.offline:
+        import capk_index
+        capk_index.search(opts.package)
+    else:
+        search(opts.package, timeout=opts.timeout, deadline=opts.deadline, use_cache=not opts.no_cache)
@@ -0,0 +1,192 @@
+import csv
+import gzip
+import io
+import re
+import tarfile
+
+import config_find
+import sorted_index
+
+# Registries that publish their full list of package names.
+# Each entry is (url, extra request headers, function that turns the streamed response into names).
+
+def _aur_names(r):
+    with gzip.GzipFile(fileobj=r.raw) as f:
+        for line in f:
+            line = line.decode("utf-8", "replace").strip()
+            if line and not line.startswith("#"):
+                yield line
+
+def _pypi_names(r):
+    for project in r.json().get("projects", []):
+        yield project["name"]
+
+_NPM_ID = re.compile(rb'"id":"([^"]+)"')
+
+def _npm_names(r):
+    for line in r.iter_lines():
+        match = _NPM_ID.search(line)
+        if match and not match.group(1).startswith(b"_design/"):
+            yield match.group(1).decode("utf-8", "replace")
+
+def _crates_names(r):
+    with tarfile.open(fileobj=r.raw, mode="r|gz") as tar:
+        for member in tar:
+            if member.name.endswith("/data/crates.csv"):
+                text = io.TextIOWrapper(tar.extractfile(member), encoding="utf-8")
+                csv.field_size_limit(1 << 24)
+                for row in csv.DictReader(text):
+                    yield row["name"]
+                # The rest of the dump is not needed
+                return
+
+def _homebrew_names(r):
+    for formula in r.json():
+        yield formula["name"]
+
+SOURCES = {
+    "AUR": ("https://aur.archlinux.org/packages.gz", {}, _aur_names),
+    "PyPI": ("https://pypi.org/simple/", {"Accept": "application/vnd.pypi.simple.v1+json"}, _pypi_names),
+    "npm": ("https://replicate.npmjs.com/_all_docs", {}, _npm_names),
+    "crates.io": ("https://static.crates.io/db-dump.tar.gz", {}, _crates_names),
+    "Homebrew": ("https://formulae.brew.sh/api/formula.json", {}, _homebrew_names),
+}
+
+def normalize(registry, name):
+    """Return the form `name` is stored under in the index of `registry`."""
+    name = name.strip().lower()
+    if registry == "PyPI":
+        # PEP 503: runs of -, _ and . are equivalent
+        name = re.sub(r"[-_.]+", "-", name)
+    return name
+
+def index_path(registry):
+    return config_find.cache_file(f"index-{registry}.txt")
+
+def sync(registries=None, timeout=60):
+    """
+    Download the full name list of each registry in SOURCES and store it as a sorted index.
+
+    Every index is a plain text file with one normalized name per line, sorted bytewise, so lookups can
+    binary search it through mmap without loading it. Files are replaced atomically.
+
+    Parameters:
+        registries (list | None): Registry names to sync, defaults to every registry in SOURCES.
+        timeout (float): Connect/read timeout for each download in seconds.
+
+    Returns:
+        dict: Registry name -> number of names stored, or None if the download failed.
+    """
+    # Imported here so offline lookups do not pay for requests
+    import capk
+
+    counts = {}
+    for registry in registries or SOURCES:
+        url, headers, parse = SOURCES[registry]
+        path = index_path(registry)
+        if not path:
+            print(f"Could not create the cache folder {config_find.cache_dir()}, nowhere to store the index.")
+            return counts
+
+        print(f"[{registry}] Downloading {url}")
+        try:
+            r = capk.get_session(url).get(url, headers=headers, timeout=timeout, stream=True)
+            r.raise_for_status()
+            r.raw.decode_content = True
+            names = {normalize(registry, n).encode("utf-8") for n in parse(r)}
+            r.close()
+
+            sorted_index.write(path, names)
+            counts[registry] = len(names)
+            print(f"[{registry}] Stored {len(names)} names")
+        except Exception as e:
+            print(f"[{registry}] Error: {e}")
+            counts[registry] = None
+    return counts
+
+def _open(registry):
+    """Return the mmap of the index for `registry`, or None if it was never synced."""
+    return sorted_index.open_map(index_path(registry))
+
+def indexed():
+    """Return the registries that have a synced index."""
+    return [registry for registry in SOURCES if _open(registry) is not None]
+
+def lookup(registry, name):
+    """
+    Check whether `name` is in the synced index of `registry`.
+
+    Returns:
+        bool | None: True or False, or None when the registry has no index.
+    """
+    mm = _open(registry)
+    if mm is None:
+        return None
+    key = normalize(registry, name).encode("utf-8")
+    return next(sorted_index.lines_from(mm, sorted_index.bisect(mm, key)), None) == key
+
+def _distance(a, b, limit):
+    """Levenshtein distance between `a` and `b`, giving up with limit + 1 once it gets larger than `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def near_misses(registry, name, limit=5, max_distance=2):
+    """
+    Return up to `limit` indexed names close to `name`: names it is a prefix of first,
+    then names within `max_distance` edits that share its first character.
+    """
+    mm = _open(registry)
+    if mm is None:
+        return []
+    key = normalize(registry, name).encode("utf-8")
+    if not key:
+        return []
+
+    matches = []
+    for line in sorted_index.prefixed(mm, key):
+        if len(matches) >= limit:
+            break
+        if line != key:
+            matches.append(line.decode("utf-8", "replace"))
+
+    if len(matches) < limit:
+        scored = []
+        start = sorted_index.bisect(mm, key[:1])
+        stop = sorted_index.bisect(mm, key[:1] + b"\xff")
+        for line in sorted_index.lines_from(mm, start, stop):
+            if line != key and not line.startswith(key):
+                distance = _distance(key, line, max_distance)
+                if distance <= max_distance:
+                    scored.append((distance, line.decode("utf-8", "replace")))
+        matches += [line for _, line in sorted(scored)[:limit - len(matches)]]
+
+    return matches
+
+def search(pkg):
+    """Print offline results for `pkg` from every synced index, with near misses when there is no exact hit."""
+    registries = indexed()
+    if not registries:
+        print("No offline indexes yet, run 'capk --sync' first.")
+        return
+
+    print(f"\n📦 Offline results for '{pkg}':")
+    for registry in registries:
+        if lookup(registry, pkg):
+            print(f"{registry:<12}: ✅ Found")
+        else:
+            similar = near_misses(registry, pkg)
+            hint = f" (did you mean: {', '.join(similar)})" if similar else ""
+            print(f"{registry:<12}: ❌ Not Found{hint}")
+
+    missing = [registry for registry in SOURCES if registry not in registries]
+    if missing:
+        print(f"\nNot synced: {', '.join(missing)}")
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+import config_find
+
+URL = "https://raw.githubusercontent.com/crust-project/car/refs/heads/main/existing-packages.txt"
+# Refresh the cached list in the background once it is older than this many seconds
+MAX_AGE = 6 * 60 * 60
+TIMEOUT = 5
+# After a failed download, wait this many seconds before trying again
+RETRY = 5 * 60
+
+_packages = None
+_lock = threading.Lock()
+_refreshing = threading.Event()
+# When the last download failed, so an offline machine does not try on every unknown command
+_failed = {"time": 0}
+
+def _paths():
+    path = config_find.cache_file("car-packages.txt")
+    if not path:
+        return None, None
+    return path, path + ".json"
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _load():
+    """Load the cached list from disk into memory. Returns False when there is no cached list yet."""
+    global _packages
+    path, _ = _paths()
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "r") as f:
+            packages = {line.strip() for line in f if line.strip()}
+    except OSError:
+        return False
+    with _lock:
+        _packages = packages
+    return True
+
+def refresh():
+    """
+    Download the car package list if it changed, using the ETag from the last download.
+
+    The list is written to ~/.cache/crust (never the working directory), atomically, and then
+    swapped into memory. Network and disk errors are ignored; the old list stays in use, and the
+    failure is remembered so the next try waits RETRY seconds.
+    """
+    global _packages
+    path, meta_path = _paths()
+    if not path:
+        return
+
+    # Imported here so looking names up never pays for requests
+    import requests
+
+    meta = _read_meta(meta_path)
+    headers = {}
+    if meta.get("etag") and os.path.exists(path):
+        headers["If-None-Match"] = meta["etag"]
+
+    try:
+        r = requests.get(URL, headers=headers, timeout=TIMEOUT)
+    except requests.RequestException:
+        _failed["time"] = time.time()
+        return
+
+    if r.status_code == 200:
+        packages = {line.strip() for line in r.text.splitlines() if line.strip()}
+        with _lock:
+            _packages = packages
+        try:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write("\n".join(sorted(packages)) + "\n")
+            os.replace(tmp, path)
+        except OSError:
+            # Kept in memory for this session only
+            return
+        meta["etag"] = r.headers.get("ETag")
+    elif r.status_code != 304:
+        _failed["time"] = time.time()
+        return
+
+    meta["checked"] = time.time()
+    try:
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+
+def _refresh_in_background():
+    if _refreshing.is_set() or time.time() - _failed["time"] < RETRY:
+        return
+    _refreshing.set()
+
+    def run():
+        try:
+            refresh()
+        finally:
+            _refreshing.clear()
+
+    threading.Thread(target=run, daemon=True).start()
+
+def is_package(name):
+    """
+    Check whether `name` is a package car can install.
+
+    Answers from the in-memory set, never waiting for the network. The cached list is loaded from disk
+    on first use and refreshed in the background once it is older than MAX_AGE. Without a cached list
+    it is downloaded in the background, and until then every name is unknown (False).
+    """
+    if _packages is None and not _load():
+        _refresh_in_background()
+    else:
+        _, meta_path = _paths()
+        if meta_path and time.time() - _read_meta(meta_path).get("checked", 0) > MAX_AGE:
+            _refresh_in_background()
+
+    with _lock:
+        return _packages is not None and name in _packages
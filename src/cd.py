@@ -1,42 +1,47 @@
+import collections
 import os
+import time
+
+import frecency
+import fs_index
 
 def search_directory(directory, target):
     """
-    Recursively search for a directory named `target` starting from `directory`.
+    Search for a directory named `target` below `directory`, nearest first.
     
-    Searches the filesystem depth-first: first checks immediate subdirectories under `directory` for a name match, then recursively searches each subdirectory. Prints progress for each directory checked. PermissionError and OSError while listing a directory are caught, a diagnostic message is printed, and the search continues.
+    Asks the background directory index (fs_index) first, which answers from memory. When `directory` is not indexed yet, or the index has no match, the tree is searched breadth-first with os.scandir, so a match one level down is found before anything deeper. Directories in fs_index.PRUNE (.git, node_modules, __pycache__, ...) are skipped. PermissionError and OSError while listing a directory are ignored and the search continues.
     
     Parameters:
         directory (str): Filesystem path to start searching from.
         target (str): Name of the directory to find.
     
     Returns:
-        str or None: The full path to the first found directory named `target`, or None if not found or if an error prevents accessing parts of the tree.
+        str or None: The full path to the nearest directory named `target`, or None if not found.
     """
+    indexed = fs_index.find(target, directory)
+    if indexed and os.path.isdir(indexed):
+        return indexed
 
-    try:
-        items = os.listdir(directory)
+    queue = collections.deque([directory])
+    checked = 0
+    while queue:
+        current = queue.popleft()
+        try:
+            with os.scandir(current) as entries:
+                subdirs = sorted(
+                    entry.name for entry in entries
+                    if entry.is_dir(follow_symlinks=False) and entry.name not in fs_index.PRUNE
+                )
+        except (PermissionError, OSError):
+            continue
 
-        # Check if target directory exists in current directory
-        for item in items:
-            item_path = os.path.join(directory, item)
-            if os.path.isdir(item_path):
-                print(f"    📁 Checking directory: {item}")
-                if item == target:
-                    return item_path
-            else:
-                pass
+        checked += 1
+        if checked % 1000 == 0:
+            print(f"    📁 Checked {checked} directories...", end="\r", flush=True)
 
-        # If not found, recursively search subdirectories
-        for item in items:
-            item_path = os.path.join(directory, item)
-            if os.path.isdir(item_path):
-                result = search_directory(item_path, target)
-                if result:
-                    return result
-    except (PermissionError, OSError) as e:
-        print(f"    ❌ Permission denied or error in {directory}: {e}")
-        pass
+        if target in subdirs:
+            return os.path.join(current, target)
+        queue.extend(os.path.join(current, name) for name in subdirs)
 
     return None
 
@@ -44,10 +49,10 @@ def main(find_item):
     """
     Search for a directory named `find_item` starting from the current working directory, print progress, and if found attempt to change into it.
     
-    Displays a sorted list of immediate subdirectories in the current working directory, then performs a recursive search for the first directory whose name matches `find_item`. Prints status messages for start, progress, errors, success, and failure. If the target is found, attempts to change the process's current working directory to the found path; any permission or OS errors are caught and only reported (not raised).
+    Displays a sorted list of immediate subdirectories in the current working directory, then searches below it for the nearest directory whose name matches `find_item`. Prints status messages for start, progress, errors, success, and failure. If the target is found, attempts to change the process's current working directory to the found path; any permission or OS errors are caught and only reported (not raised).
     
     Parameters:
-        find_item (str): Name of the directory to locate (matched against directory basenames). The search is case-sensitive and returns the first match found in a depth-first traversal.
+        find_item (str): Name of the directory to locate (matched against directory basenames). The search is case-sensitive and returns the least deep match.
     """
     start_dir = os.getcwd()
     print(f"Starting search from: {start_dir}")
@@ -78,6 +83,42 @@ def main(find_item):
     else:
         print(f"❌ Directory '{find_item}' not found in {start_dir} or its subdirectories")
 
+def builtin(args):
+    """
+    The `cd` builtin. Without arguments it goes home. When the directory does not exist, the best
+    remembered match from frecency is used, and searching below the current directory comes last.
+    """
+    if args == [".."] and os.getcwd() == "/":
+        print("THERE IS NO ESCAPE")
+        time.sleep(1)
+        os.system("curl ascii.live/rick")
+        return
+
+    arg = " ".join(args)
+    entered_dir = os.path.expanduser(arg) if arg else os.path.expanduser("~")
+    try:
+        os.chdir(entered_dir)
+        frecency.add(os.getcwd())
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        # Jump to the best remembered match first; searching the tree is the last resort
+        known = frecency.best(arg)
+        while known:
+            try:
+                os.chdir(known)
+            except OSError:
+                # Deleted or no longer allowed in since it was remembered
+                frecency.forget(known)
+                known = frecency.best(arg)
+                continue
+            print(f"→ {known}")
+            frecency.add(known)
+            break
+        else:
+            start_dir = os.getcwd()
+            main(entered_dir)
+            if os.getcwd() != start_dir:
+                frecency.add(os.getcwd())
+
 if __name__ == "__main__":
     while True:
         main(input("find: "))
\ No newline at end of file
@@ -0,0 +1,183 @@
+import bz2
+import glob
+import gzip
+import lzma
+import os
+import tarfile
+import threading
+
+import config_find
+import sorted_index
+
+# Local "command not found" database: maps executable names to the packages that ship them.
+# Built from the file lists package managers already keep on disk, stored as sorted
+# "command<TAB>manager<TAB>package" lines and searched in place.
+
+PACMAN_SYNC = "/var/lib/pacman/sync"
+APT_LISTS = "/var/lib/apt/lists"
+
+BIN_DIRS = ("usr/bin/", "usr/sbin/", "bin/", "sbin/", "usr/local/bin/")
+
+INSTALL = {
+    "pacman": "sudo pacman -S {pkg}",
+    "apt": "sudo apt install {pkg}",
+}
+
+_OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+_building = threading.Event()
+
+def _command(path):
+    """Return the command name if `path` (relative to /) is an executable directory entry, otherwise None."""
+    for bin_dir in BIN_DIRS:
+        if path.startswith(bin_dir):
+            name = path[len(bin_dir):]
+            if name and "/" not in name:
+                return name
+    return None
+
+def _pacman_entries(sync_dir):
+    """Yield (command, package) pairs from the pacman .files sync databases in `sync_dir`."""
+    for db in sorted(glob.glob(os.path.join(sync_dir, "*.files"))):
+        try:
+            tar = tarfile.open(db, mode="r:*")
+        except (tarfile.TarError, OSError) as e:
+            # e.g. zstd compressed databases, which tarfile cannot read
+            print(f"warn: skipping {db}: {e}")
+            continue
+        with tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith("/files"):
+                    continue
+                # Entries are named <pkgname>-<pkgver>-<pkgrel>/files
+                package = member.name.split("/", 1)[0].rsplit("-", 2)[0]
+                for line in tar.extractfile(member).read().decode("utf-8", "replace").splitlines():
+                    command = _command(line)
+                    if command:
+                        yield command, package
+
+def _apt_entries(lists_dir):
+    """Yield (command, package) pairs from the apt Contents-* indexes in `lists_dir`."""
+    for contents in sorted(glob.glob(os.path.join(lists_dir, "*Contents-*"))):
+        # Files are named ..._Contents-<arch>, optionally with a compression suffix
+        ext = os.path.splitext(os.path.basename(contents).rsplit("Contents-", 1)[1])[1]
+        if ext and ext not in _OPENERS:
+            print(f"warn: skipping {contents}: unsupported compression")
+            continue
+        try:
+            with _OPENERS.get(ext, open)(contents, "rb") as f:
+                for line in f:
+                    fields = line.decode("utf-8", "replace").rsplit(None, 1)
+                    if len(fields) != 2:
+                        continue
+                    command = _command(fields[0])
+                    if not command:
+                        continue
+                    for package in fields[1].split(","):
+                        # Packages are written as section/name
+                        yield command, package.rsplit("/", 1)[-1]
+        except OSError as e:
+            print(f"warn: skipping {contents}: {e}")
+
+def index_path():
+    return config_find.cache_file("command-not-found.txt")
+
+def _sources(pacman_dir, apt_dir):
+    return glob.glob(os.path.join(pacman_dir, "*.files")) + glob.glob(os.path.join(apt_dir, "*Contents-*"))
+
+def build(pacman_dir=PACMAN_SYNC, apt_dir=APT_LISTS, path=None):
+    """
+    Build the command -> package index from the pacman and apt file databases.
+
+    Parameters:
+        pacman_dir (str): Folder holding pacman `*.files` sync databases.
+        apt_dir (str): Folder holding apt `*Contents-*` files.
+        path (str | None): Where to write the index, defaults to ~/.cache/crust/command-not-found.txt.
+
+    Returns:
+        int | None: Number of entries written, or None when there is nowhere to write the index.
+    """
+    path = path or index_path()
+    if not path:
+        return None
+
+    lines = set()
+    for command, package in _pacman_entries(pacman_dir):
+        lines.add(f"{command}\tpacman\t{package}".encode("utf-8"))
+    for command, package in _apt_entries(apt_dir):
+        lines.add(f"{command}\tapt\t{package}".encode("utf-8"))
+
+    sorted_index.write(path, lines)
+    return len(lines)
+
+def is_stale(pacman_dir=PACMAN_SYNC, apt_dir=APT_LISTS, path=None):
+    """True when the index is missing or older than any of the package manager databases."""
+    path = path or index_path()
+    if not path or not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(source) > built for source in _sources(pacman_dir, apt_dir))
+
+def build_in_background():
+    """Rebuild the index on a daemon thread, unless a rebuild is already running."""
+    if _building.is_set():
+        return
+    _building.set()
+
+    def run():
+        try:
+            build()
+        except Exception as e:
+            print(f"warn: could not build the command-not-found index: {e}")
+        finally:
+            _building.clear()
+
+    threading.Thread(target=run, daemon=True).start()
+
+def lookup(command, path=None):
+    """
+    Return the packages that provide `command`.
+
+    Returns:
+        list: (manager, package) pairs, empty when nothing is known (or the index is not built yet).
+    """
+    mm = sorted_index.open_map(path or index_path())
+    if mm is None:
+        return []
+    key = command.encode("utf-8") + b"\t"
+    providers = []
+    for line in sorted_index.prefixed(mm, key):
+        _, manager, package = line.decode("utf-8", "replace").split("\t")
+        providers.append((manager, package))
+    return providers
+
+def suggest(command):
+    """
+    Print which packages provide `command` and how to install them.
+
+    Kicks off a background rebuild when the package databases changed since the index was built.
+
+    Returns:
+        bool: True if at least one provider was found.
+    """
+    if not (os.path.isdir(PACMAN_SYNC) or os.path.isdir(APT_LISTS)):
+        return False
+    if is_stale():
+        build_in_background()
+
+    providers = lookup(command)
+    if not providers:
+        return False
+
+    print(f"{command} was not found, but is provided by:")
+    for manager, package in providers:
+        print(f"     {package} ({manager}), install with: {INSTALL[manager].format(pkg=package)}")
+    return True
+
+if __name__ == "__main__":
+    print("Building the command-not-found index...")
+    count = build()
+    if count is None:
+        print(f"Could not create the cache folder {config_find.cache_dir()}, nowhere to store the index.")
+    else:
+        print(f"Stored {count} commands in {index_path()}")
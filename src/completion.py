@@ -0,0 +1,347 @@
+import bisect
+import os
+import tarfile
+
+import builtin_registry
+import config_manager
+import fs_index
+import git_prompt
+
+# Tab completion engine used by main.tab_completer.
+# Command names come from a prefix trie over every executable on $PATH plus aliases and builtins (see builtin_registry),
+# rebuilt only when PATH or one of its directories changes. Paths are completed from cached,
+# sorted os.scandir listings, and some commands get their own completers (git, pacman, ssh).
+
+_END = ""
+
+def _build_trie(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+    return trie
+
+def _trie_words(trie, prefix):
+    """Return every word in `trie` starting with `prefix`, sorted."""
+    node = trie
+    for char in prefix:
+        node = node.get(char)
+        if node is None:
+            return []
+    words = []
+    stack = [(node, prefix)]
+    while stack:
+        node, word = stack.pop()
+        for char, child in node.items():
+            if char == _END:
+                words.append(word)
+            else:
+                stack.append((child, word + char))
+    return sorted(words)
+
+_commands = {"key": None, "trie": None}
+
+def _path_key():
+    """PATH itself plus the mtime of each of its directories; changes whenever a command is (un)installed."""
+    path = os.environ.get("PATH", "")
+    mtimes = []
+    for directory in path.split(os.pathsep):
+        try:
+            mtimes.append(os.stat(directory).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return path, tuple(mtimes)
+
+def path_executables():
+    """Return the set of executable names on $PATH."""
+    names = set()
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return names
+
+def commands(prefix):
+    """Return every command name (executables, aliases, builtins) starting with `prefix`."""
+    aliases = config_manager.aliases()
+    builtins = builtin_registry.names()
+    key = (_path_key(), tuple(sorted(aliases)), tuple(builtins))
+    if _commands["key"] != key:
+        _commands["trie"] = _build_trie(path_executables() | set(aliases) | set(builtins))
+        _commands["key"] = key
+    return _trie_words(_commands["trie"], prefix)
+
+# Absolute directory -> (mtime, sorted names, names that are directories), least recently used first
+_listings = {}
+MAX_LISTINGS = 64
+
+def _listing(directory):
+    # Keyed by the absolute path: "." is another directory after every cd
+    directory = os.path.abspath(directory)
+    mtime = os.stat(directory).st_mtime_ns
+    cached = _listings.pop(directory, None)
+    if cached and cached[0] == mtime:
+        _listings[directory] = cached
+        return cached
+
+    names = []
+    dirs = set()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            names.append(entry.name)
+            try:
+                if entry.is_dir():
+                    dirs.add(entry.name)
+            except OSError:
+                pass
+    names.sort()
+    cached = (mtime, names, dirs)
+    _listings[directory] = cached
+    while len(_listings) > MAX_LISTINGS:
+        del _listings[next(iter(_listings))]
+    return cached
+
+def paths(text, only_dirs=False):
+    """
+    Complete `text` as a filesystem path. Directories get a trailing separator, `~` is kept as typed.
+
+    Listings are cached per directory until its mtime changes, and matching is a binary search over
+    the sorted names, so huge directories stay fast after the first Tab.
+    """
+    if text.startswith('~'):
+        path = os.path.expanduser(text)
+        prefix = '~'
+    else:
+        path = text
+        prefix = ''
+
+    if os.path.sep in path:
+        dirname = os.path.dirname(path) or os.path.sep
+        basename = os.path.basename(path)
+    else:
+        dirname = '.'
+        basename = path
+
+    # Directory-only completion can be answered from the background index without touching the disk
+    names = fs_index.subdirs(dirname) if only_dirs else None
+    if names is not None:
+        dirs = set(names)
+    else:
+        try:
+            _, names, dirs = _listing(dirname)
+        except OSError:
+            return []
+
+    matches = []
+    for i in range(bisect.bisect_left(names, basename), len(names)):
+        entry = names[i]
+        if not entry.startswith(basename):
+            break
+        if only_dirs and entry not in dirs:
+            continue
+        full_path = os.path.join(dirname, entry) if dirname != '.' else entry
+        if prefix:
+            full_path = prefix + full_path[len(os.path.expanduser(prefix)):]
+        matches.append(full_path + os.path.sep if entry in dirs else full_path)
+    return matches
+
+# Per-command completers
+
+_sources = {}
+
+def cached_source(name, key, load):
+    """Return load(), reusing the previous result while `key` stays the same."""
+    cached = _sources.get(name)
+    if cached and cached[0] == key:
+        return cached[1]
+    value = load()
+    _sources[name] = (key, value)
+    return value
+
+def _mtimes(*paths):
+    key = []
+    for path in paths:
+        try:
+            key.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            key.append(None)
+    return tuple(key)
+
+GIT_SUBCOMMANDS = [
+    'add', 'bisect', 'blame', 'branch', 'checkout', 'cherry-pick', 'clone', 'commit', 'config',
+    'diff', 'fetch', 'grep', 'init', 'log', 'merge', 'mv', 'pull', 'push', 'rebase', 'remote',
+    'reset', 'restore', 'revert', 'rm', 'show', 'stash', 'status', 'switch', 'tag', 'worktree'
+]
+GIT_BRANCH_COMMANDS = {'branch', 'checkout', 'switch', 'merge', 'rebase', 'cherry-pick', 'log', 'diff', 'reset'}
+
+def git_branches():
+    """Return the local branch names of the current repository, read from refs/heads and packed-refs."""
+    repo = git_prompt.find_repo()
+    if repo is None:
+        return []
+    _, git_dir = repo
+    # Worktrees keep their refs in the main git dir
+    commondir = os.path.join(git_dir, "commondir")
+    if os.path.exists(commondir):
+        with open(commondir, "r") as f:
+            git_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    heads = os.path.join(git_dir, "refs", "heads")
+    packed = os.path.join(git_dir, "packed-refs")
+
+    def load():
+        branches = set()
+        for root, _, files in os.walk(heads):
+            for name in files:
+                branches.add(os.path.relpath(os.path.join(root, name), heads))
+        try:
+            with open(packed, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].startswith("refs/heads/"):
+                        branches.add(parts[1][len("refs/heads/"):])
+        except OSError:
+            pass
+        return sorted(branches)
+
+    # Creating a top-level branch touches refs/heads; nested ones (feature/x) are picked up on the next change
+    return cached_source(("git", git_dir), _mtimes(heads, packed), load)
+
+def complete_git(words, text):
+    if len(words) == 1:
+        return [c for c in GIT_SUBCOMMANDS if c.startswith(text)]
+    if words[1] in GIT_BRANCH_COMMANDS and not text.startswith('-'):
+        return [b for b in git_branches() if b.startswith(text)] + paths(text)
+    return None
+
+PACMAN_LOCAL = "/var/lib/pacman/local"
+PACMAN_SYNC = "/var/lib/pacman/sync"
+
+def pacman_installed():
+    def load():
+        try:
+            # Entries are named <pkgname>-<pkgver>-<pkgrel>
+            return sorted(entry.name.rsplit("-", 2)[0] for entry in os.scandir(PACMAN_LOCAL) if entry.is_dir())
+        except OSError:
+            return []
+    return cached_source("pacman-local", _mtimes(PACMAN_LOCAL), load)
+
+def pacman_available():
+    try:
+        dbs = sorted(os.path.join(PACMAN_SYNC, name) for name in os.listdir(PACMAN_SYNC) if name.endswith(".db"))
+    except OSError:
+        return []
+
+    def load():
+        names = set()
+        for db in dbs:
+            try:
+                with tarfile.open(db, mode="r:*") as tar:
+                    for member in tar:
+                        if member.isdir():
+                            names.add(member.name.rstrip("/").rsplit("-", 2)[0])
+            except (tarfile.TarError, OSError):
+                # e.g. zstd compressed databases
+                continue
+        return sorted(names)
+    return cached_source("pacman-sync", _mtimes(*dbs), load)
+
+def complete_pacman(words, text):
+    if text.startswith('-'):
+        return None
+    operation = next((w for w in words[1:] if w.startswith('-') and not w.startswith('--')), "")
+    if operation.startswith('-S'):
+        source = pacman_available()
+    elif operation.startswith(('-R', '-Q')):
+        source = pacman_installed()
+    else:
+        return None
+    start = bisect.bisect_left(source, text)
+    matches = []
+    for name in source[start:]:
+        if not name.startswith(text):
+            break
+        matches.append(name)
+    return matches
+
+SSH_CONFIG = os.path.expanduser("~/.ssh/config")
+KNOWN_HOSTS = os.path.expanduser("~/.ssh/known_hosts")
+
+def ssh_hosts():
+    def load():
+        hosts = set()
+        try:
+            with open(SSH_CONFIG, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) > 1 and parts[0].lower() == "host":
+                        hosts.update(h for h in parts[1:] if not any(c in h for c in "*?!"))
+        except OSError:
+            pass
+        try:
+            with open(KNOWN_HOSTS, "r") as f:
+                for line in f:
+                    # Hashed entries (|1|...) cannot be completed
+                    if not line.strip() or line.startswith(("#", "|", "@")):
+                        continue
+                    for host in line.split()[0].split(","):
+                        if host.startswith("["):
+                            host = host[1:].split("]", 1)[0]
+                        hosts.add(host)
+        except OSError:
+            pass
+        return sorted(hosts)
+    return cached_source("ssh", _mtimes(SSH_CONFIG, KNOWN_HOSTS), load)
+
+def complete_ssh(words, text):
+    if text.startswith('-'):
+        return None
+    user, at, host = text.rpartition('@')
+    return [f"{user}{at}{h}" for h in ssh_hosts() if h.startswith(host)]
+
+def complete_scp(words, text):
+    # Remote hosts as well as local files
+    return (complete_ssh(words, text) or []) + paths(text)
+
+def complete_cd(words, text):
+    return paths(text, only_dirs=True)
+
+COMPLETERS = {
+    'git': complete_git,
+    'pacman': complete_pacman,
+    'ssh': complete_ssh,
+    'scp': complete_scp,
+}
+
+def register(command, completer):
+    """
+    Use `completer(words, text)` for the arguments of `command`.
+
+    `words` are the words before the one being completed, `text` is that word. Return a list of
+    candidates, or None to fall back to path completion.
+    """
+    COMPLETERS[command] = completer
+
+def complete(line, begin, end, text):
+    """Return the candidates for `text`, which spans line[begin:end]."""
+    words = line[:begin].split()
+    if len(words) == 0:
+        return commands(text)
+
+    # Complete the arguments of an alias like those of the command it expands to
+    expanded = config_manager.aliases().get(words[0], words[0]).split()
+    command = expanded[0] if expanded else words[0]
+    completer = COMPLETERS.get(command) or builtin_registry.completer(command)
+    if completer:
+        matches = completer(words, text)
+        if matches is not None:
+            return matches
+    return paths(text)
@@ -1,20 +1,54 @@
 import os
 
+# Directory -> (.crust folder found for it, the directory's mtime then), so the walk runs once per
+# directory. Only found folders are remembered: a .crust folder created later must still be found
+_found = {}
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 def find_crust_folder():
-    current_dir = os.getcwd()
+    start_dir = current_dir = os.getcwd()
+
+    cached = _found.get(start_dir)
+    # A remembered folder may have been deleted since, or a nearer one made in this directory
+    if cached and cached[1] == _mtime(start_dir) and os.path.isdir(cached[0]):
+        return cached[0]
 
     while True:
         candidate = os.path.join(current_dir, '.crust')
         if os.path.isdir(candidate):
+            _found[start_dir] = (candidate, _mtime(start_dir))
             return candidate  # Found the .crust folder
 
         parent_dir = os.path.dirname(current_dir)
         if parent_dir == current_dir:
             # Reached the root directory, .crust not found
+            _found.pop(start_dir, None)
             return None
 
         current_dir = parent_dir
 
+def cache_dir():
+    """Return crust's cache folder, $XDG_CACHE_HOME/crust (~/.cache/crust), the same from every directory."""
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "crust")
+
+def cache_file(name):
+    """
+    Return the path of `name` inside the cache folder (see cache_dir), creating the folder if needed.
+
+    Returns None when the folder cannot be created, so callers can fall back to keeping things in memory.
+    """
+    directory = cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+    return os.path.join(directory, name)
+
 if __name__ == "__main__":
     path = find_crust_folder()
     if path:
@@ -0,0 +1,127 @@
+import importlib.util
+import os
+import sys
+
+import config_find
+
+# Loads the config modules (aliases.py, cmds.py, prompt.py) from the .crust folder that applies to the
+# current directory. Each file is executed again only when its mtime changes, so edits take effect on
+# the next prompt without a restart, and unchanged files cost a single stat per prompt.
+
+# Path -> (mtime, module)
+_modules = {}
+# Path -> (mtime, text)
+_sources = {}
+# .crust folder -> ((aliases mtime, cmds mtime), alias table)
+_alias_tables = {}
+# The .crust folder found last, kept for directories outside of any .crust tree
+_last = {"folder": None}
+
+def folder():
+    """
+    Return the .crust folder for the current directory. Outside of every .crust tree (e.g. /tmp) the
+    one found last stays in use, which is the startup folder until another one is entered.
+
+    Returns:
+        str | None: The folder, or None when none was ever found.
+    """
+    found = config_find.find_crust_folder()
+    if found is not None:
+        _last["folder"] = found
+    return _last["folder"]
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def load(name):
+    """
+    Return the config module `name` (e.g. "prompt") from the current .crust folder.
+
+    The module is executed again when the file changed since it was last loaded. If the new version
+    fails to load, a warning is printed and the previous version stays in use.
+
+    Returns:
+        module | None: The module, or None when there is no such file.
+    """
+    configs = folder()
+    if configs is None:
+        return None
+    path = os.path.join(configs, f"{name}.py")
+    mtime = _mtime(path)
+    if mtime is None:
+        return None
+
+    cached = _modules.get(path)
+    if cached and cached[0] == mtime:
+        sys.modules[name] = cached[1]
+        return cached[1]
+
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    except Exception as e:
+        print(f"warn: could not load {path} due to an {e} error")
+        if cached:
+            sys.modules[name] = cached[1]
+            return cached[1]
+        return None
+
+    _modules[path] = (mtime, module)
+    return module
+
+def source(filename):
+    """Return the text of `filename` in the current .crust folder (re-read only when it changes), or None."""
+    configs = folder()
+    if configs is None:
+        return None
+    path = os.path.join(configs, filename)
+    mtime = _mtime(path)
+    if mtime is None:
+        return None
+
+    cached = _sources.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r") as f:
+        text = f.read()
+    _sources[path] = (mtime, text)
+    return text
+
+def prompt():
+    return load("prompt")
+
+def aliases():
+    """
+    Return the alias table {name: command} for the current .crust folder.
+
+    aliases.py imports cmds.py itself, so the table is rebuilt when either file changes. Only string
+    values count as aliases; modules and helpers imported by aliases.py are left out.
+    """
+    configs = folder()
+    if configs is None:
+        return {}
+
+    key = (_mtime(os.path.join(configs, "aliases.py")), _mtime(os.path.join(configs, "cmds.py")))
+    cached = _alias_tables.get(configs)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    # A cmds.py change alone does not touch aliases.py, so drop it to force a re-run
+    if cached:
+        _modules.pop(os.path.join(configs, "aliases.py"), None)
+
+    module = load("aliases")
+    table = {}
+    if module is not None:
+        table = {
+            name: value for name, value in vars(module).items()
+            if not name.startswith("_") and isinstance(value, str)
+        }
+    _alias_tables[configs] = (key, table)
+    return table
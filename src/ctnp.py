@@ -61,3 +61,12 @@ dependencies = []
 
     with open(".gitignore", "w") as f:
         f.write(".vscode\n.idea\n*__pycache__*")
+
+
+def main(args):
+    """The `ctnp` builtin: `ctnp python [name]` creates a Python project."""
+    print("ctnp - create the next project")
+
+    if args[:1] == ["python"]:
+        project_name = args[1] if len(args) > 1 else "my_project"
+        python(project_name)
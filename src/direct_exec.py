@@ -0,0 +1,154 @@
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+# Runs simple command lines without starting bash. A line with no shell syntax (pipes, redirections,
+# variables, globs, ...) is split with shlex, the program is looked up in a hash table like bash's own
+# `hash`, and it is executed directly. Everything else still goes to `bash -c`. The table is dropped
+# whenever PATH changes, and a command that is not on PATH is reported before anything is forked.
+# jobs starts what resolve() returns, so every command line has that one path to a process.
+
+# Characters that need bash: operators, expansions, globs, comments and escapes
+SHELL_CHARS = set("|&;<>()$`\\*?[]{}!#\n")
+
+# bash builtins and keywords that have no program of the same name, or that change the shell's own state
+BASH_BUILTINS = {
+    ".", ":", "alias", "bg", "bind", "break", "builtin", "caller", "case", "cd", "command", "compgen",
+    "complete", "compopt", "continue", "coproc", "declare", "dirs", "disown", "do", "done", "elif",
+    "else", "enable", "esac", "eval", "exec", "exit", "export", "fc", "fg", "fi", "for", "function",
+    "getopts", "hash", "help", "history", "if", "jobs", "let", "local", "logout", "mapfile", "popd",
+    "pushd", "read", "readarray", "readonly", "return", "select", "set", "shift", "shopt", "source",
+    "suspend", "then", "time", "times", "trap", "type", "typeset", "ulimit", "umask", "unalias",
+    "unset", "until", "wait", "while",
+}
+
+# Command name -> full path, valid for the PATH in _table["path"]
+_table = {"path": None, "commands": {}}
+
+def _commands():
+    path = os.environ.get("PATH", "")
+    if _table["path"] != path:
+        _table["path"] = path
+        _table["commands"] = {}
+    return _table["commands"]
+
+def which(name):
+    """
+    Return the full path of the program `name`, from the hash table when possible.
+
+    Returns:
+        str | None: The path, or None when there is no such executable.
+    """
+    if "/" in name:
+        return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+
+    commands = _commands()
+    path = commands.get(name)
+    # The program may have been removed or moved since it was hashed
+    if path and os.access(path, os.X_OK):
+        return path
+    commands.pop(name, None)
+
+    for directory in _table["path"].split(os.pathsep):
+        candidate = os.path.join(directory or ".", name)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            commands[name] = candidate
+            return candidate
+    return None
+
+def hashed():
+    """Return the hash table, {name: path}."""
+    return dict(_commands())
+
+def rehash():
+    """Forget every hashed path, like `hash -r`."""
+    _table["commands"] = {}
+
+def split(line):
+    """
+    Split `line` into argv when it can run without bash.
+
+    Returns:
+        list | None: The arguments, or None when the line uses shell syntax, starts with a variable
+            assignment or a bash builtin, or does not parse.
+    """
+    if any(c in SHELL_CHARS for c in line):
+        return None
+    lexer = shlex.shlex(line, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    argv = []
+    try:
+        while True:
+            # Where the word starts in `line`: only a tilde that was typed unquoted there is expanded
+            rest = line[lexer.instream.tell():]
+            start = len(line) - len(rest.lstrip())
+            word = lexer.get_token()
+            if word is None:
+                break
+            argv.append(os.path.expanduser(word) if word.startswith("~") and line[start:start + 1] == "~" else word)
+    except ValueError:
+        return None
+    if not argv or "=" in argv[0] or argv[0] in BASH_BUILTINS:
+        return None
+    return argv
+
+def exit_status(returncode):
+    """Turn a subprocess return code into a shell exit status: killed by signal N is 128 + N, like bash."""
+    return 128 - returncode if returncode < 0 else returncode
+
+def resolve(line):
+    """
+    Work out how to start `line`.
+
+    Returns:
+        tuple | None: (argv, executable) for subprocess, with executable None for lines that go to
+            bash, or None when the program does not exist (the error is printed, nothing is forked).
+    """
+    argv = split(line)
+    if argv is None:
+        return ["bash", "-c", line], None
+    path = which(argv[0])
+    if path is None:
+        print(f"crust: {argv[0]}: command not found", file=sys.stderr)
+        return None
+    return argv, path
+
+def hash_builtin(args):
+    """The `hash` builtin: list the hashed commands, or forget them with -r."""
+    if args == ["-r"]:
+        rehash()
+        return
+    for name, path in sorted(hashed().items()):
+        print(f"{name}\t{path}")
+
+def benchmark(line="true", count=200):
+    """
+    Time `count` runs of `line` through bash and directly.
+
+    Returns:
+        tuple: Milliseconds per run through bash and directly.
+    """
+    devnull = subprocess.DEVNULL
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(["bash", "-c", line], stdout=devnull)
+    through_bash = (time.perf_counter() - start) * 1000 / count
+
+    argv = split(line)
+    path = which(argv[0])
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(argv, executable=path, stdout=devnull)
+    direct = (time.perf_counter() - start) * 1000 / count
+    return through_bash, direct
+
+if __name__ == "__main__":
+    # python direct_exec.py [command line] - compare the per-command overhead
+    line = " ".join(sys.argv[1:]) or "true"
+    if split(line) is None or which(split(line)[0]) is None:
+        sys.exit(f"{line!r} cannot run without bash")
+    through_bash, direct = benchmark(line)
+    print(f"{line!r}: bash -c {through_bash:.2f} ms, direct {direct:.2f} ms, saved {through_bash - direct:.2f} ms per command")
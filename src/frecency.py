@@ -0,0 +1,148 @@
+import atexit
+import json
+import os
+import time
+
+import config_find
+
+# Remembers every directory crust successfully cd's into, ranked by frecency (how often x how recently),
+# so `cd foo` can jump to a known directory without searching the filesystem.
+# The ranking and aging follow z/zoxide: every visit adds 1 to a directory's rank, and once the ranks
+# add up to more than MAX_TOTAL they are all scaled down and the ones that drop below 1 are forgotten.
+# The file is written at most every SAVE_INTERVAL seconds and at exit. Each save merges this session's
+# visits into what is on disk, so sessions running side by side do not overwrite each other.
+
+MAX_TOTAL = 9000
+AGING = 0.9
+SAVE_INTERVAL = 60
+
+_entries = None
+# Fixed when the store is first loaded, so later cd's into projects with their own .crust keep one store
+_file = None
+# Since the last save: directory -> [visits, last visit], the directories that are gone, when it was
+_pending = {"visits": {}, "forgotten": set(), "saved": 0}
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load():
+    global _entries, _file
+    if _entries is None:
+        _file = path = config_find.cache_file("frecency.json")
+        _entries = _read(path) if path else {}
+        _pending["saved"] = time.time()
+        atexit.register(save)
+    return _entries
+
+def save():
+    """Merge this session's visits and removals into the file on disk and write it."""
+    global _entries
+    path = _file
+    if not path or _entries is None:
+        return
+    if not _pending["visits"] and not _pending["forgotten"]:
+        return
+    entries = _read(path)
+    for directory, (visits, last) in _pending["visits"].items():
+        entry = entries.setdefault(directory, {"rank": 0, "time": 0})
+        entry["rank"] += visits
+        entry["time"] = max(entry["time"], last)
+    for directory in _pending["forgotten"]:
+        entries.pop(directory, None)
+    if sum(e["rank"] for e in entries.values()) > MAX_TOTAL:
+        for directory in list(entries):
+            entries[directory]["rank"] *= AGING
+            if entries[directory]["rank"] < 1:
+                del entries[directory]
+    _entries = entries
+    _pending.update(visits={}, forgotten=set(), saved=time.time())
+    try:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def _save_soon():
+    if time.time() - _pending["saved"] >= SAVE_INTERVAL:
+        save()
+
+def add(directory):
+    """Record a visit to `directory`."""
+    entries = load()
+    directory = os.path.abspath(directory)
+    now = time.time()
+    entry = entries.setdefault(directory, {"rank": 0, "time": 0})
+    entry["rank"] += 1
+    entry["time"] = now
+    visit = _pending["visits"].setdefault(directory, [0, 0])
+    visit[0] += 1
+    visit[1] = now
+    _pending["forgotten"].discard(directory)
+    _save_soon()
+
+def forget(directory):
+    """Forget `directory`, e.g. because it was deleted or can no longer be entered."""
+    load().pop(directory, None)
+    _pending["visits"].pop(directory, None)
+    _pending["forgotten"].add(directory)
+    _save_soon()
+
+def score(entry, now):
+    """Frecency of an entry: its rank, weighted up when it was visited recently."""
+    age = now - entry["time"]
+    if age < 60 * 60:
+        return entry["rank"] * 4
+    if age < 24 * 60 * 60:
+        return entry["rank"] * 2
+    if age < 7 * 24 * 60 * 60:
+        return entry["rank"] / 2
+    return entry["rank"] / 4
+
+def matches(query):
+    """
+    Return the remembered directories matching `query`, best first.
+
+    Every whitespace separated token of the query has to appear in the path, in order and ignoring
+    case (`cd pro cru` matches ~/projects/crust). Directories whose last component matches the last
+    token exactly, then those where it merely starts with it, rank above the rest.
+    """
+    tokens = query.lower().split()
+    if not tokens:
+        return []
+
+    now = time.time()
+    found = []
+    for path, entry in load().items():
+        lowered = path.lower()
+        position = 0
+        for token in tokens:
+            position = lowered.find(token, position)
+            if position == -1:
+                break
+            position += len(token)
+        else:
+            basename = os.path.basename(lowered)
+            if basename == tokens[-1]:
+                boost = 2
+            elif basename.startswith(tokens[-1]):
+                boost = 1
+            else:
+                boost = 0
+            found.append((boost, score(entry, now), path))
+
+    found.sort(reverse=True)
+    return [path for _, _, path in found]
+
+def best(query):
+    """Return the best remembered directory for `query` that still exists, forgetting ones that are gone."""
+    for path in matches(query):
+        if os.path.isdir(path):
+            return path
+        forget(path)
+    return None
@@ -0,0 +1,249 @@
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+
+# In-memory index of directory names under a few roots (the home directory by default), shared by the
+# cd search and path completion. A background thread builds it with os.scandir and then keeps it
+# current with inotify, so lookups never touch the disk. Only watched directories are answered for:
+# without inotify (non-Linux) or past the watch limit (see WATCH_SHARE) the index could go stale, so
+# covers() and subdirs() return None there and callers scan the directory themselves. When the kernel
+# drops events (queue overflow) the roots are scanned again.
+
+PRUNE = {".git", "node_modules", "__pycache__", ".cache", ".venv", "venv", ".tox", ".mypy_cache"}
+# Stop indexing past this many directories to keep memory bounded
+MAX_DIRS = 500000
+# Every session watches its own tree, and editors and other tools need watches too: one session takes at
+# most this share of fs.inotify.max_user_watches, and never more than MAX_WATCHES. The tree is walked
+# breadth-first, so the watched directories are the ones nearest the roots.
+WATCH_SHARE = 16
+MAX_WATCHES = 16384
+MAX_USER_WATCHES = "/proc/sys/fs/inotify/max_user_watches"
+
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+
+_EVENT = struct.Struct("iIII")
+
+# Directory -> set of names of its subdirectories
+_children = {}
+# Directory name -> set of full paths with that name
+_by_name = {}
+_lock = threading.Lock()
+ready = threading.Event()
+
+_inotify = {"fd": None, "wd": {}, "paths": {}, "full": False, "limit": MAX_WATCHES, "roots": []}
+
+def watch_limit():
+    """Return how many inotify watches this session may use, see WATCH_SHARE."""
+    try:
+        with open(MAX_USER_WATCHES, "r") as f:
+            system = int(f.read())
+    except (OSError, ValueError):
+        return MAX_WATCHES
+    return max(min(system // WATCH_SHARE, MAX_WATCHES), 0)
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    if not name:
+        return None
+    libc = ctypes.CDLL(name, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+def _watch(libc, path):
+    if _inotify["fd"] is None or _inotify["full"] or len(_inotify["wd"]) >= _inotify["limit"]:
+        # Past the limit directories are indexed but not watched, like when the system runs out
+        return
+    wd = libc.inotify_add_watch(_inotify["fd"], os.fsencode(path), WATCH_MASK)
+    if wd < 0:
+        if ctypes.get_errno() == errno.ENOSPC:
+            # Out of watches (fs.inotify.max_user_watches); the rest of the tree is indexed but not watched
+            _inotify["full"] = True
+        return
+    _inotify["wd"][wd] = path
+    _inotify["paths"][path] = wd
+
+def _add_tree(root, libc=None):
+    """Index `root` and every directory below it, breadth-first, watching each one when possible."""
+    queue = collections.deque([root])
+    while queue:
+        directory = queue.popleft()
+        if len(_children) >= MAX_DIRS:
+            return
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False) and entry.name not in PRUNE:
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+        with _lock:
+            _children[directory] = names
+            for name in names:
+                _by_name.setdefault(name, set()).add(os.path.join(directory, name))
+        if libc:
+            _watch(libc, directory)
+        queue.extend(os.path.join(directory, name) for name in sorted(names))
+
+def _remove_tree(path, libc=None):
+    """Forget `path` and everything below it."""
+    prefix = path + os.sep
+    with _lock:
+        gone = [d for d in _children if d == path or d.startswith(prefix)]
+        for directory in gone:
+            for name in _children.pop(directory):
+                paths = _by_name.get(name)
+                if paths:
+                    paths.discard(os.path.join(directory, name))
+        paths = _by_name.get(os.path.basename(path))
+        if paths:
+            paths.discard(path)
+        parent = _children.get(os.path.dirname(path))
+        if parent is not None:
+            parent.discard(os.path.basename(path))
+    for directory in gone:
+        wd = _inotify["paths"].pop(directory, None)
+        if wd is not None:
+            _inotify["wd"].pop(wd, None)
+            if libc:
+                libc.inotify_rm_watch(_inotify["fd"], wd)
+
+def _rescan(libc):
+    """Index and watch the roots again from scratch."""
+    for root in _inotify["roots"]:
+        _remove_tree(root, libc)
+    _inotify["full"] = False
+    for root in _inotify["roots"]:
+        _add_tree(root, libc)
+
+def _handle(libc, data):
+    offset = 0
+    overflow = False
+    while offset + _EVENT.size <= len(data):
+        wd, mask, _, length = _EVENT.unpack_from(data, offset)
+        name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+        offset += _EVENT.size + length
+
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost, so any directory may be out of date
+            overflow = True
+            continue
+        directory = _inotify["wd"].get(wd)
+        if directory is None or not mask & IN_ISDIR or not name:
+            continue
+        name = os.fsdecode(name)
+        if name in PRUNE:
+            continue
+        path = os.path.join(directory, name)
+
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            with _lock:
+                _children.setdefault(directory, set()).add(name)
+            _add_tree(path, libc)
+            with _lock:
+                _by_name.setdefault(name, set()).add(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            _remove_tree(path, libc)
+    if overflow:
+        _rescan(libc)
+
+def _run(roots):
+    libc = None
+    try:
+        libc = _libc()
+        if libc:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                _inotify["fd"] = fd
+                _inotify["limit"] = watch_limit()
+            else:
+                libc = None
+    except OSError:
+        libc = None
+
+    _inotify["roots"] = [os.path.abspath(root) for root in roots]
+    for root in _inotify["roots"]:
+        _add_tree(root, libc)
+    ready.set()
+
+    if not libc:
+        return
+    fd = _inotify["fd"]
+    while True:
+        select.select([fd], [], [])
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            continue
+        _handle(libc, data)
+
+_started = threading.Event()
+
+def start(roots=None):
+    """Start indexing `roots` (default: the home directory) on a daemon thread. Only the first call does anything."""
+    if _started.is_set():
+        return
+    _started.set()
+    roots = roots if roots is not None else [os.path.expanduser("~")]
+    threading.Thread(target=_run, args=(roots,), daemon=True, name="fs_index").start()
+
+def _watched(path):
+    # Unwatched directories are indexed but may be stale
+    return path in _inotify["paths"]
+
+def covers(path):
+    """True when the index is built and `path` is one of the indexed and watched directories."""
+    if not ready.is_set():
+        return False
+    path = os.path.abspath(path)
+    with _lock:
+        return path in _children and _watched(path)
+
+def subdirs(directory):
+    """Return the sorted subdirectory names of `directory`, or None when it is not indexed and watched."""
+    if not ready.is_set():
+        return None
+    directory = os.path.abspath(directory)
+    with _lock:
+        names = _children.get(directory)
+        return sorted(names) if names is not None and _watched(directory) else None
+
+def find(name, start):
+    """
+    Return the nearest directory called `name` below `start`: the least deep one wins, ties go
+    alphabetically, like a breadth-first search would find it.
+
+    Returns:
+        str | None: The path, or None when there is no match or `start` is not indexed.
+    """
+    start = os.path.abspath(start)
+    if not covers(start):
+        return None
+    prefix = start.rstrip(os.sep) + os.sep
+    with _lock:
+        candidates = [path for path in _by_name.get(name, ()) if path.startswith(prefix)]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda path: (path.count(os.sep), path))
@@ -0,0 +1,157 @@
+import os
+import subprocess
+import threading
+import time
+
+# Git information for prompt modules, without running git on every prompt.
+# The repo root and branch come straight from the .git folder; dirty/ahead/behind counts
+# need `git status` and are computed on a background thread, so the prompt only ever shows
+# the last finished result.
+
+# Seconds `git status` may run before it is given up on
+DEADLINE = 2
+# Seconds before the status of an unchanged repo is computed again
+STATUS_TTL = 3
+
+_branches = {}
+_status = {}
+_running = set()
+_lock = threading.Lock()
+
+def find_repo(path=None):
+    """
+    Find the git repository containing `path` (the current directory by default) by walking up for `.git`.
+
+    Returns:
+        tuple | None: (repo root, git dir), or None when not inside a repository.
+    """
+    current = os.path.abspath(path or os.getcwd())
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            # Worktrees and submodules have a .git file pointing at the real git dir
+            try:
+                with open(dot_git, "r") as f:
+                    content = f.read().strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir:"):
+                return current, os.path.normpath(os.path.join(current, content[len("gitdir:"):].strip()))
+            return None
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def branch(git_dir):
+    """
+    Return the checked out branch of `git_dir`, or the short commit hash when HEAD is detached.
+
+    The answer is cached until the HEAD file changes.
+    """
+    head = os.path.join(git_dir, "HEAD")
+    try:
+        mtime = os.stat(head).st_mtime_ns
+    except OSError:
+        return "?"
+
+    cached = _branches.get(git_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(head, "r") as f:
+            content = f.read().strip()
+    except OSError:
+        return "?"
+
+    if content.startswith("ref:"):
+        name = content[len("ref:"):].strip()
+        if name.startswith("refs/heads/"):
+            name = name[len("refs/heads/"):]
+    else:
+        name = content[:7]
+
+    _branches[git_dir] = (mtime, name)
+    return name
+
+def _compute_status(root):
+    try:
+        output = subprocess.run(
+            ["git", "--no-optional-locks", "-C", root, "status", "--porcelain=v2", "--branch"],
+            capture_output=True, text=True, timeout=DEADLINE,
+        ).stdout
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+
+    dirty = False
+    ahead = behind = 0
+    for line in output.splitlines():
+        if line.startswith("# branch.ab "):
+            parts = line.split()
+            ahead, behind = int(parts[2][1:]), int(parts[3][1:])
+        elif not line.startswith("#"):
+            dirty = True
+    return {"dirty": dirty, "ahead": ahead, "behind": behind}
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def status(root, git_dir):
+    """
+    Return the last known {"dirty", "ahead", "behind"} of the repo at `root`, or None if it is not known yet.
+
+    Never waits for git: when the cached value is older than STATUS_TTL, or HEAD or the index changed
+    since, a refresh is started on a background thread and the old value is returned. git status is
+    killed after DEADLINE seconds, in which case no markers are shown.
+    """
+    key = (_mtime(os.path.join(git_dir, "HEAD")), _mtime(os.path.join(git_dir, "index")))
+    with _lock:
+        cached = _status.get(root)
+        expired = cached is None or cached[1] != key or time.monotonic() - cached[0] > STATUS_TTL
+        if expired and root not in _running:
+            _running.add(root)
+
+            def run():
+                result = _compute_status(root)
+                with _lock:
+                    # Stamp with the key from before git ran, so changes made meanwhile trigger another refresh
+                    _status[root] = (time.monotonic(), key, result)
+                    _running.discard(root)
+
+            threading.Thread(target=run, daemon=True).start()
+
+    return cached[2] if cached else None
+
+def segment(show_status=True):
+    """
+    Return the git part of the prompt as Rich markup, or "" outside a repository.
+
+    Parameters:
+        show_status (bool): Also show dirty (*) and ahead/behind (⇡/⇣) markers once they are known.
+    """
+    repo = find_repo()
+    if repo is None:
+        return ""
+    root, git_dir = repo
+
+    extras = ""
+    if show_status:
+        info = status(root, git_dir)
+        if info:
+            if info["dirty"]:
+                extras += "*"
+            if info["ahead"]:
+                extras += f"⇡{info['ahead']}"
+            if info["behind"]:
+                extras += f"⇣{info['behind']}"
+            if extras:
+                extras = f"[yellow]{extras}[/] "
+
+    return f"[cyan] {os.path.basename(root)} [/][bold green] {branch(git_dir)}[/] {extras}"
@@ -0,0 +1,387 @@
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+from rich.markup import escape
+
+import base
+
+# Command history in SQLite: one row per command with its directory, exit code, duration and start time,
+# appended by every crust session to the same database in WAL mode, so parallel sessions never clobber
+# each other and a crash loses at most the command that was running. Rows are written by a background
+# thread, so the prompt never waits for the disk. An FTS5 index (trigram, so any substring matches) makes
+# searching fast with millions of rows: `history --grep`, and Ctrl-R, which opens an interactive search.
+# Readline's own list (for the arrow keys) is filled from the newest READLINE_ENTRIES rows at startup.
+
+DATABASE = "~/.crust_history.sqlite3"
+# The readline history file used before, imported once when the database is created
+LEGACY_FILE = "~/.crust_history"
+READLINE_ENTRIES = 1000
+# Rows shown by `history` and matches shown by the Ctrl-R search
+DEFAULT_LIMIT = 20
+SEARCH_MATCHES = 8
+# What Ctrl-R types in front of the line (and runs), see load_readline
+SEARCH_COMMAND = "history --search"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,
+    cwd TEXT,
+    exit_code INTEGER,
+    duration REAL,
+    started REAL,
+    session INTEGER
+);
+CREATE INDEX IF NOT EXISTS history_cwd ON history (cwd, id);
+CREATE INDEX IF NOT EXISTS history_failed ON history (id) WHERE exit_code != 0;
+"""
+# Substring search needs the trigram tokenizer (SQLite 3.34); older versions match whole words
+FTS_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(command, content='history', content_rowid='id', tokenize='{}')"
+FTS_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, command) VALUES (new.id, new.command);
+END;
+"""
+
+_state = {"created": False, "trigram": False, "writer": None}
+_writes = queue.Queue()
+# sqlite3 connections belong to the thread that made them, and pipelines run builtins on worker threads
+_local = threading.local()
+_create_lock = threading.Lock()
+
+def path():
+    return os.path.expanduser(DATABASE)
+
+def _connect():
+    connection = sqlite3.connect(path(), timeout=5)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only risks the last commits on power loss, never corruption
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+def _create(connection):
+    with connection:
+        connection.executescript(SCHEMA)
+        try:
+            connection.execute(FTS_TABLE.format("trigram"))
+        except sqlite3.OperationalError:
+            connection.execute(FTS_TABLE.format("unicode61"))
+        connection.executescript(FTS_TRIGGER)
+
+def _import_legacy(connection):
+    legacy = os.path.expanduser(LEGACY_FILE)
+    try:
+        with open(legacy, "r", errors="replace") as f:
+            commands = [line.rstrip("\n") for line in f if line.strip()]
+        started = os.path.getmtime(legacy)
+    except OSError:
+        return
+    with connection:
+        connection.executemany(
+            "INSERT INTO history (command, started) VALUES (?, ?)", ((command, started) for command in commands)
+        )
+
+def connection():
+    """Return this thread's reading connection, creating the database on first use."""
+    db = getattr(_local, "connection", None)
+    if db is None:
+        with _create_lock:
+            new = not _state["created"] and not os.path.exists(path())
+            db = _connect()
+            if not _state["created"]:
+                _create(db)
+                if new:
+                    _import_legacy(db)
+                sql = db.execute("SELECT sql FROM sqlite_master WHERE name = 'history_fts'").fetchone()
+                _state["trigram"] = bool(sql and "trigram" in sql[0])
+                _state["created"] = True
+        _local.connection = db
+    return db
+
+def _write():
+    db = _connect()
+    while True:
+        row = _writes.get()
+        if row is None:
+            break
+        try:
+            with db:
+                db.execute(
+                    "INSERT INTO history (command, cwd, exit_code, duration, started, session) VALUES (?, ?, ?, ?, ?, ?)", row
+                )
+        except sqlite3.Error as e:
+            print(f"warn: could not save history: {e}", file=sys.stderr)
+    db.close()
+
+def record(command, cwd, exit_code, started, duration=None):
+    """
+    Queue a finished command for the database; the writer thread stores it.
+
+    Parameters:
+        duration (float | None): How long the command ran, measured when it returned; until now when None.
+    """
+    if not command.strip() or command.startswith(SEARCH_COMMAND):
+        return
+    if _state["writer"] is None:
+        connection()
+        _state["writer"] = threading.Thread(target=_write, daemon=True, name="history")
+        _state["writer"].start()
+    if duration is None:
+        duration = time.time() - started
+    _writes.put((command, cwd, exit_code, duration, started, os.getpid()))
+
+def close():
+    """Wait for queued commands to be written, at exit."""
+    if _state["writer"] is not None:
+        _writes.put(None)
+        _state["writer"].join(timeout=5)
+        _state["writer"] = None
+
+def load_readline(readline):
+    """Fill readline's history (arrow keys) with the newest commands and bind Ctrl-R to the search."""
+    try:
+        rows = connection().execute("SELECT command FROM history ORDER BY id DESC LIMIT ?", (READLINE_ENTRIES,)).fetchall()
+    except sqlite3.Error as e:
+        print(f"Warning: Could not load command history: {e}")
+        rows = []
+    previous = None
+    for (command,) in reversed(rows):
+        if command != previous:
+            readline.add_history(command)
+        previous = command
+    readline.set_history_length(READLINE_ENTRIES)
+    # Ctrl-R puts the search command in front of what was typed and runs it, see search_line
+    readline.parse_and_bind(f'"\\C-r": "\\C-a{SEARCH_COMMAND} \\n"')
+
+def _fts_query(text):
+    if _state["trigram"]:
+        return '"' + text.replace('"', '""') + '"'
+    # Whole words, the last one as a prefix
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    return " ".join(words[:-1] + [words[-1] + "*"]) if words else ""
+
+def query(grep=None, cwd=None, failed=False, limit=DEFAULT_LIMIT):
+    """
+    Return the newest matching rows, newest first.
+
+    Parameters:
+        grep (str | None): Text the command has to contain.
+        cwd (str | None): Only commands run in this directory.
+        failed (bool): Only commands that exited with a non-zero code.
+        limit (int): At most this many rows.
+
+    Returns:
+        list: (id, command, cwd, exit_code, duration, started) tuples.
+    """
+    db = connection()
+    table = "history"
+    order = "id"
+    conditions = []
+    parameters = []
+    if grep:
+        # Trigrams need three characters; shorter text is looked for in the newest rows directly
+        if _state["trigram"] and len(grep) < 3:
+            conditions.append("instr(command, ?) > 0")
+            parameters.append(grep)
+        else:
+            # Walking the full-text index newest first stops as soon as enough rows are found
+            table = "history_fts JOIN history ON history.id = history_fts.rowid"
+            order = "history_fts.rowid"
+            conditions.append("history_fts MATCH ?")
+            parameters.append(_fts_query(grep))
+    if cwd:
+        conditions.append("cwd = ?")
+        parameters.append(cwd)
+    if failed:
+        conditions.append("exit_code != 0")
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    sql = f"SELECT id, history.command, cwd, exit_code, duration, started FROM {table}{where} ORDER BY {order} DESC LIMIT ?"
+    return db.execute(sql, parameters + [limit]).fetchall()
+
+def matches(text, limit=SEARCH_MATCHES):
+    """Return up to `limit` different commands containing `text`, most recently used first."""
+    found = []
+    offset = 0
+    # Fetch in pages until enough distinct commands turn up
+    while len(found) < limit:
+        rows = query(grep=text or None, limit=offset + limit * 8)[offset:]
+        if not rows:
+            break
+        for row in rows:
+            if row[1] not in found:
+                found.append(row[1])
+                if len(found) == limit:
+                    break
+        offset += len(rows)
+    return found
+
+def _read_key(fd):
+    data = os.read(fd, 1)
+    if data == b"\x1b":
+        # Arrow keys arrive as escape sequences; a lone Esc has nothing after it
+        import select
+        while select.select([fd], [], [], 0.03)[0]:
+            data += os.read(fd, 1)
+            if data[-1:].isalpha() or data[-1:] == b"~":
+                break
+    elif data and data[0] >= 0xc0:
+        # The rest of a UTF-8 character
+        length = 2 if data[0] < 0xe0 else 3 if data[0] < 0xf0 else 4
+        data += os.read(fd, length - 1)
+    return data.decode("utf-8", "replace")
+
+def _draw(out, text, found, selected):
+    # Drawn below the cursor, which is left at the end of the search text
+    width = max(shutil.get_terminal_size().columns - 1, 20)
+    header = f"(history search) {text}"[-width:]
+    lines = [header]
+    for i, command in enumerate(found):
+        marker = "\x1b[1;38;5;209m>\x1b[0m " if i == selected else "  "
+        lines.append(marker + command.replace("\n", " ")[:width - 2])
+    out.write("\r\x1b[J" + "\r\n".join(lines))
+    if len(lines) > 1:
+        out.write(f"\x1b[{len(lines) - 1}A")
+    out.write(f"\r\x1b[{len(header)}C")
+    out.flush()
+
+def search(text=""):
+    """
+    Interactive search: type to narrow, Up/Down or Ctrl-R/Ctrl-P/Ctrl-N to move, Enter or Tab to take
+    the selected command, Esc or Ctrl-C to give up.
+
+    Returns:
+        str | None: The chosen command.
+    """
+    import termios
+    import tty
+    fd = sys.stdin.fileno()
+    out = sys.stdout
+    saved = termios.tcgetattr(fd)
+    selected = 0
+    chosen = None
+    try:
+        tty.setraw(fd)
+        while True:
+            found = matches(text)
+            selected = min(selected, max(len(found) - 1, 0))
+            _draw(out, text, found, selected)
+            key = _read_key(fd)
+            if key in ("\r", "\n", "\t"):
+                chosen = found[selected] if found else None
+                break
+            if key in ("\x1b", "\x03", "\x07", "\x04"):
+                break
+            if key in ("\x7f", "\x08"):
+                text = text[:-1]
+                selected = 0
+            elif key in ("\x12", "\x0e", "\x1b[B", "\x1bOB"):
+                selected += 1
+            elif key in ("\x10", "\x1b[A", "\x1bOA"):
+                selected = max(selected - 1, 0)
+            elif key.isprintable():
+                text += key
+                selected = 0
+    finally:
+        out.write("\r\x1b[J")
+        out.flush()
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+    return chosen
+
+def prefill(readline, text):
+    """Put `text` on the next input line, ready to be edited or run."""
+    def hook():
+        readline.insert_text(text)
+        readline.redisplay()
+        readline.set_pre_input_hook(None)
+    readline.set_pre_input_hook(hook)
+
+USAGE = "usage: history [N] [--grep TEXT] [--cwd [DIR]] [--failed] | history --search [TEXT]"
+
+def parse_args(args):
+    """Parse history's options into a dict; prints the usage and returns None for anything else."""
+    opts = {"grep": None, "cwd": None, "failed": False, "limit": DEFAULT_LIMIT, "search": None}
+    i = 0
+    try:
+        while i < len(args):
+            arg = args[i]
+            if arg == "--search":
+                opts["search"] = " ".join(args[i + 1:])
+                break
+            elif arg == "--grep":
+                opts["grep"] = args[i + 1]
+                i += 1
+            elif arg == "--cwd":
+                if i + 1 < len(args) and not args[i + 1].startswith("-") and not args[i + 1].isdigit():
+                    opts["cwd"] = os.path.abspath(os.path.expanduser(args[i + 1]))
+                    i += 1
+                else:
+                    opts["cwd"] = os.getcwd()
+            elif arg == "--failed":
+                opts["failed"] = True
+            elif arg.isdigit():
+                opts["limit"] = int(arg)
+            else:
+                raise ValueError(arg)
+            i += 1
+    except (IndexError, ValueError):
+        print(USAGE)
+        return {"usage": True}
+    return opts
+
+def rows(opts, lines=None):
+    """Yield "id<TAB>exit code<TAB>directory<TAB>command" lines, oldest first, for pipelines."""
+    if opts.get("usage"):
+        return
+    found = query(opts["grep"] or opts["search"], opts["cwd"], opts["failed"], opts["limit"])
+    for id, command, cwd, exit_code, _, _ in reversed(found):
+        yield f"{id}\t{'' if exit_code is None else exit_code}\t{cwd or ''}\t{command}"
+
+def search_line(line):
+    """
+    Run the search Ctrl-R asked for, when `line` is one. What follows SEARCH_COMMAND is taken as it was
+    typed, so a `|`, quotes or extra spaces in it are searched for and not run.
+
+    Returns:
+        bool: True when `line` was a search.
+    """
+    if line != SEARCH_COMMAND and not line.startswith(SEARCH_COMMAND + " "):
+        return False
+    main(dict(parse_args([]), search=line[len(SEARCH_COMMAND):].strip()))
+    return True
+
+def main(opts):
+    """The `history` builtin: show the newest commands (oldest of them first), filtered by the options."""
+    if opts.get("usage"):
+        return
+    if opts["search"] is not None:
+        import readline
+        # Ctrl-R put this line in readline's history; the search is not worth keeping there
+        length = readline.get_current_history_length()
+        while length and (readline.get_history_item(length) or "").startswith(SEARCH_COMMAND):
+            readline.remove_history_item(length - 1)
+            length -= 1
+        if sys.stdin.isatty():
+            chosen = search(opts["search"])
+            if chosen is not None:
+                prefill(readline, chosen)
+            return
+        opts = dict(opts, grep=opts["search"])
+
+    found = query(opts["grep"], opts["cwd"], opts["failed"], opts["limit"])
+    table = base.Table(show_header=True, box=None, pad_edge=False)
+    table.add_column("#", style="dim", justify="right")
+    table.add_column("When", style="cyan", no_wrap=True)
+    table.add_column("Exit", justify="right")
+    table.add_column("Took", style="dim", justify="right")
+    table.add_column("Command", style="white")
+    for id, command, cwd, exit_code, duration, started in reversed(found):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(started)) if started else ""
+        exit_text = "" if exit_code is None else f"[red]{exit_code}[/red]" if exit_code else "0"
+        took = f"{duration:.1f}s" if duration is not None else ""
+        table.add_row(str(id), when, exit_text, took, escape(command))
+    base.console.print(table)
@@ -0,0 +1,261 @@
+import math
+import os
+import re
+import sys
+import time
+
+import base
+
+# The `lsusb` and `disk usage`/`df -h` builtins. USB devices are read from sysfs and filesystems from
+# /proc/self/mountinfo plus os.statvfs, so nothing is forked and mount points with spaces in them
+# survive. Both can redraw themselves with --watch, rewriting only the lines that changed.
+# The paths are module constants so a fake sysfs or proc tree can be swapped in.
+
+SYSFS_USB = "/sys/bus/usb/devices"
+MOUNTINFO = "/proc/self/mountinfo"
+# Where distributions install the USB ID database lsusb takes its names from
+USB_IDS = ("/usr/share/hwdata/usb.ids", "/usr/share/misc/usb.ids", "/usr/share/usb.ids", "/var/lib/usbutils/usb.ids")
+
+WATCH_INTERVAL = 2
+
+def _read(path):
+    try:
+        with open(path, "r", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+# (vendor id, product id) -> (vendor name, product name); product id None for the vendor alone
+_usb_names = {}
+
+def _usb_ids_names(wanted):
+    """Look the (vendor, product) pairs in `wanted` up in usb.ids, in one pass over the file."""
+    path = next((p for p in USB_IDS if os.path.exists(p)), None)
+    vendors = {vendor for vendor, _ in wanted}
+    for vendor, product in wanted:
+        _usb_names[(vendor, product)] = (None, None)
+    if path is None:
+        return
+    vendor = vendor_name = None
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            if not line.startswith("\t"):
+                # Device classes and other tables follow the vendor list
+                if line.startswith("C "):
+                    break
+                vendor, vendor_name = line[:4], line[4:].strip()
+                if vendor in vendors:
+                    _usb_names[(vendor, None)] = (vendor_name, None)
+            elif vendor in vendors and not line.startswith("\t\t"):
+                product = line[1:5]
+                if (vendor, product) in wanted:
+                    _usb_names[(vendor, product)] = (vendor_name, line[5:].strip())
+
+def usb_devices(root=None):
+    """
+    Return the USB devices under `root` (SYSFS_USB by default), sorted by bus and device number.
+
+    Returns:
+        list: (bus, device, "vendor:product", description) tuples. The description comes from usb.ids
+            like lsusb's, or from the manufacturer and product strings the device reports.
+    """
+    root = root or SYSFS_USB
+    found = []
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return []
+    for entry in entries:
+        # Interfaces (1-1:1.0) live next to the devices
+        if ":" in entry.name:
+            continue
+        busnum = _read(os.path.join(entry.path, "busnum"))
+        devnum = _read(os.path.join(entry.path, "devnum"))
+        vendor = _read(os.path.join(entry.path, "idVendor"))
+        product = _read(os.path.join(entry.path, "idProduct"))
+        if not (busnum and devnum and vendor and product):
+            continue
+        strings = [_read(os.path.join(entry.path, name)) for name in ("manufacturer", "product")]
+        found.append((int(busnum), int(devnum), vendor, product, " ".join(s for s in strings if s)))
+
+    missing = {(v, p) for _, _, v, p, _ in found if (v, p) not in _usb_names}
+    if missing:
+        _usb_ids_names(missing)
+
+    devices = []
+    for bus, device, vendor, product, reported in sorted(found):
+        vendor_name, product_name = _usb_names.get((vendor, product), (None, None))
+        vendor_name = vendor_name or _usb_names.get((vendor, None), (None, None))[0]
+        description = " ".join(n for n in (vendor_name, product_name) if n) if product_name else reported
+        devices.append((f"{bus:03d}", f"{device:03d}", f"{vendor}:{product}", description or vendor_name or ""))
+    return devices
+
+def _unescape(field):
+    # mountinfo writes space, tab, newline and backslash in paths as octal escapes (\040)
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+def filesystems(mountinfo=None):
+    """
+    Return the mounted filesystems that have a size, like df: one entry per mount point (the last
+    filesystem mounted there, which hides the others) and per device (at its shortest mount point).
+
+    Returns:
+        list: (source, fstype, mount point, size, used, available) tuples, sizes in bytes.
+    """
+    by_mount_point = {}
+    try:
+        with open(mountinfo or MOUNTINFO, "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    for line in lines:
+        fields = line.split()
+        try:
+            separator = fields.index("-")
+            device, mount_point = fields[2], _unescape(fields[4])
+            fstype, source = fields[separator + 1], _unescape(fields[separator + 2])
+        except (ValueError, IndexError):
+            continue
+        try:
+            st = os.statvfs(mount_point)
+        except OSError:
+            continue
+        if st.f_blocks == 0:
+            continue
+        size = st.f_blocks * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        by_mount_point[mount_point] = (device, (source, fstype, mount_point, size, used, st.f_bavail * st.f_frsize))
+
+    by_device = {}
+    for device, entry in by_mount_point.values():
+        previous = by_device.get(device)
+        if previous is None or len(entry[2]) < len(previous[2]):
+            by_device[device] = entry
+    return list(by_device.values())
+
+def human(size):
+    """Format a byte count the way df -h does: 1024 based, rounded up, one decimal below 10."""
+    for unit in ("", "K", "M", "G", "T", "P"):
+        if size < 1024 or unit == "P":
+            break
+        size /= 1024
+    if unit == "":
+        return str(int(size))
+    if size < 10:
+        return f"{math.ceil(size * 10) / 10:.1f}{unit}"
+    return f"{math.ceil(size)}{unit}"
+
+def use_percent(used, available):
+    total = used + available
+    return f"{math.ceil(used * 100 / total)}%" if total else "-"
+
+DF_HEADERS = ("Filesystem", "Size", "Used", "Avail", "Use%", "Mounted on")
+
+def disk_rows():
+    """Return the df -h columns for every filesystem."""
+    return [
+        (source, human(size), human(used), human(available), use_percent(used, available), mount_point)
+        for source, _, mount_point, size, used, available in filesystems()
+    ]
+
+def _parse_watch(args):
+    """Parse [--watch|-w [SECONDS]]; None for anything else, so the line goes to the real tool."""
+    if not args:
+        return {"watch": None}
+    if args[0] not in ("--watch", "-w") or len(args) > 2:
+        return None
+    try:
+        interval = float(args[1]) if len(args) == 2 else WATCH_INTERVAL
+    except ValueError:
+        return None
+    return {"watch": interval if interval > 0 else WATCH_INTERVAL}
+
+def parse_lsusb(args):
+    return _parse_watch(args)
+
+def parse_df(args):
+    """Only `df -h` is the builtin; other df options run the real df."""
+    return _parse_watch(args[1:]) if args[:1] == ["-h"] else None
+
+def parse_disk(args):
+    return _parse_watch(args[1:]) if args[:1] == ["usage"] else None
+
+def watch(render, interval):
+    """
+    Print render() every `interval` seconds until Ctrl+C. After the first time only the lines that
+    changed are rewritten in place; if the number of lines changes, everything is redrawn.
+    """
+    out = sys.stdout
+    previous = []
+    try:
+        while True:
+            with base.console.capture() as capture:
+                base.console.print(render())
+            lines = capture.get().rstrip("\n").split("\n")
+            if len(lines) != len(previous):
+                if previous:
+                    # Up to the first line and clear everything below
+                    out.write(f"\x1b[{len(previous)}A\r\x1b[J")
+                out.write("\n".join(lines) + "\n")
+            else:
+                for i, (old, new) in enumerate(zip(previous, lines)):
+                    if old != new:
+                        up = len(lines) - i
+                        out.write(f"\x1b[{up}A\r\x1b[2K{new}\x1b[{up}B\r")
+            out.flush()
+            previous = lines
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print()
+
+def _disk_table():
+    table = base.Table(title="💾 Disk Usage", show_lines=True)
+    for h in DF_HEADERS:
+        table.add_column(h, style="cyan")
+    for row in disk_rows():
+        table.add_row(*row)
+    return table
+
+def disk_usage(opts):
+    """Show mounted filesystems as a table, like `df -h`, redrawn every opts["watch"] seconds when set."""
+    try:
+        if opts and opts.get("watch"):
+            watch(_disk_table, opts["watch"])
+        else:
+            base.console.print(_disk_table())
+    except Exception as e:
+        base.console.print(f"[red]Error reading disk usage: {e}[/red]")
+
+def disk_usage_rows(opts, lines=None):
+    """Yield one tab separated row per filesystem, without the header."""
+    for row in disk_rows():
+        yield "\t".join(row)
+
+def _usb_table():
+    table = base.Table(title=" USB Devices", show_lines=True)
+    table.add_column("Bus", style="cyan")
+    table.add_column("Device", style="green")
+    table.add_column("ID", style="magenta")
+    table.add_column("Description", style="yellow")
+    for device in usb_devices():
+        table.add_row(*device)
+    return table
+
+def lsusb(opts):
+    """Show the USB devices as a table, redrawn every opts["watch"] seconds when set."""
+    try:
+        if not os.path.isdir(SYSFS_USB):
+            base.console.print(f"󰍉 No USB devices ({SYSFS_USB} does not exist).", style="bold red")
+        elif opts and opts.get("watch"):
+            watch(_usb_table, opts["watch"])
+        else:
+            base.console.print(_usb_table())
+    except Exception as e:
+        base.console.print(f"󰅚 Error reading USB devices: {e}", style="bold red")
+
+def lsusb_rows(opts, lines=None):
+    """Yield one tab separated row per USB device: bus, device, ID and description."""
+    for device in usb_devices():
+        yield "\t".join(device)
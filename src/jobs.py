@@ -0,0 +1,352 @@
+import os
+import signal
+import subprocess
+import sys
+
+import direct_exec
+
+# Job control. Every command crust starts gets its own process group. A line ending in `&` keeps
+# running in the background while the prompt comes back; a foreground command gets the terminal, so
+# Ctrl+C and Ctrl+Z reach it and not crust, and a stopped command becomes a job that `fg` or `bg`
+# continues. Jobs that finish or stop are reported before the next prompt.
+
+try:
+    import termios
+except ImportError:
+    termios = None
+
+# Job id -> job dict: id, pid, command, state ("Running", "Stopped", "Done" or "Exit N"), modes, order
+_jobs = {}
+_counter = {"order": 0}
+
+def interactive():
+    """True when crust owns the terminal, so it can hand it to foreground jobs."""
+    try:
+        return os.isatty(0) and os.tcgetpgrp(0) == os.getpgrp()
+    except OSError:
+        return False
+
+def _set_foreground(pgid):
+    # Giving the terminal away from a background group raises SIGTTOU; block it just for the call
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTTOU})
+    try:
+        os.tcsetpgrp(0, pgid)
+    except OSError:
+        pass
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTTOU})
+
+def _modes():
+    if termios is None:
+        return None
+    try:
+        return termios.tcgetattr(0)
+    except termios.error:
+        return None
+
+def _restore_modes(modes):
+    if modes is None:
+        return
+    try:
+        termios.tcsetattr(0, termios.TCSADRAIN, modes)
+    except termios.error:
+        pass
+
+def _spawn(argv, executable, background):
+    options = {"executable": executable}
+    has_terminal = interactive()
+    # Without a terminal to hand over, a foreground command stays in crust's group so Ctrl+C reaches it
+    new_group = background or has_terminal
+    if new_group:
+        if sys.version_info >= (3, 11):
+            options["process_group"] = 0
+        else:
+            options["preexec_fn"] = os.setpgrp
+    if background and not has_terminal:
+        # Without job control a background job must not compete for input
+        options["stdin"] = subprocess.DEVNULL
+    process = subprocess.Popen(argv, **options)
+    if new_group:
+        # Also set it from this side, so the group exists before the terminal is handed over
+        try:
+            os.setpgid(process.pid, process.pid)
+        except OSError:
+            pass
+    if new_group and not background:
+        # Hand the terminal over at once, so a program reading it right away (vim, less, ssh) is
+        # not stopped by SIGTTIN as a background group. Done here and not in a preexec_fn, which
+        # can deadlock the child while crust's other threads run
+        _set_foreground(process.pid)
+    # The job table waits for the process; stop Popen from reaping it behind our back
+    process.returncode = 0
+    return process.pid
+
+def _start(line, background):
+    """Start `line` in a new process group and return its pid, or None when the program is missing."""
+    command = direct_exec.resolve(line)
+    if command is None:
+        return None
+    argv, executable = command
+    try:
+        return _spawn(argv, executable, background)
+    except OSError:
+        direct_exec.rehash()
+        return _spawn(["bash", "-c", line], None, background)
+
+def _status(status):
+    """Turn a waitpid status into (state, exit code) the way bash reports them."""
+    if os.WIFSTOPPED(status):
+        return "Stopped", 128 + os.WSTOPSIG(status)
+    if os.WIFSIGNALED(status):
+        return signal.strsignal(os.WTERMSIG(status)) or "Killed", 128 + os.WTERMSIG(status)
+    code = os.WEXITSTATUS(status)
+    return ("Done" if code == 0 else f"Exit {code}"), code
+
+def _add(pid, command, state):
+    job_id = max(_jobs, default=0) + 1
+    _counter["order"] += 1
+    _jobs[job_id] = {"id": job_id, "pid": pid, "command": command, "state": state,
+                     "modes": None, "order": _counter["order"]}
+    return _jobs[job_id]
+
+def _touch(job):
+    _counter["order"] += 1
+    job["order"] = _counter["order"]
+
+def _marker(job):
+    ranked = sorted(_jobs.values(), key=lambda j: j["order"], reverse=True)
+    if ranked and ranked[0] is job:
+        return "+"
+    if len(ranked) > 1 and ranked[1] is job:
+        return "-"
+    return " "
+
+def _print(job, show_pid=False):
+    pid = f" {job['pid']}" if show_pid else ""
+    print(f"[{job['id']}]{_marker(job)}{pid} {job['state']:<12} {job['command']}")
+
+def _terminal():
+    """Return (whether crust owns the terminal, its modes), taken before a foreground job can change them."""
+    has_terminal = interactive()
+    return has_terminal, _modes() if has_terminal else None
+
+def _wait_foreground(pid, command, job=None, terminal=None):
+    """
+    Give the terminal to `pid`'s group and wait until it exits or stops. A stopped job given as `job`
+    is continued once it has the terminal.
+
+    Parameters:
+        terminal (tuple | None): _terminal() from before the command started, which may already have
+            taken the terminal; read now when None.
+
+    Returns:
+        int: The exit code.
+    """
+    has_terminal, shell_modes = terminal or _terminal()
+    if has_terminal:
+        if job and job["modes"] is not None:
+            _restore_modes(job["modes"])
+        _set_foreground(pid)
+    if job is not None:
+        try:
+            os.killpg(pid, signal.SIGCONT)
+        except ProcessLookupError:
+            pass
+    try:
+        while True:
+            try:
+                _, status = os.waitpid(pid, os.WUNTRACED)
+                break
+            except KeyboardInterrupt:
+                # Without a terminal of its own the command is in crust's group and got the Ctrl+C
+                # too; wait for it to exit (like bash) so it is reaped and its status reported
+                continue
+    finally:
+        if has_terminal:
+            job_modes = _modes()
+            _set_foreground(os.getpgrp())
+            _restore_modes(shell_modes)
+
+    state, code = _status(status)
+    if state == "Stopped":
+        if job is None:
+            job = _add(pid, command, state)
+        job["state"] = state
+        job["modes"] = job_modes if has_terminal else None
+        _touch(job)
+        print()
+        _print(job)
+    elif job is not None:
+        del _jobs[job["id"]]
+    return code
+
+def run(line):
+    """
+    Run `line` as a job: in the background when it ends with a single `&`, otherwise in the foreground.
+
+    Returns:
+        subprocess.CompletedProcess: The exit code of a foreground command (128 + signal when it was
+            killed or stopped), 0 for a started background job and 127 when the program is missing.
+    """
+    stripped = line.rstrip()
+    background = stripped.endswith("&") and not stripped.endswith(("&&", "\\&", ">&", "|&"))
+    if background:
+        line = stripped[:-1].rstrip()
+
+    terminal = _terminal()
+    pid = _start(line, background)
+    if pid is None:
+        return subprocess.CompletedProcess(line, 127)
+    if background:
+        job = _add(pid, line, "Running")
+        print(f"[{job['id']}] {pid}")
+        return subprocess.CompletedProcess(line, 0)
+    return subprocess.CompletedProcess(line, _wait_foreground(pid, line, terminal=terminal))
+
+def notify():
+    """Report the jobs that finished, stopped or continued since the last prompt, and forget finished ones."""
+    for job in list(_jobs.values()):
+        try:
+            pid, status = os.waitpid(job["pid"], os.WNOHANG | os.WUNTRACED | os.WCONTINUED)
+        except ChildProcessError:
+            pid, status = job["pid"], None
+        if pid == 0:
+            continue
+        if status is None:
+            job["state"] = "Done"
+        elif os.WIFCONTINUED(status):
+            job["state"] = "Running"
+            continue
+        else:
+            job["state"], _ = _status(status)
+        _print(job)
+        if job["state"] != "Stopped":
+            del _jobs[job["id"]]
+
+def find(spec):
+    """
+    Return the job for a job spec: %n, %% or %+ (the current job), %- (the previous one) or %name
+    (the job whose command starts with name). No spec means the current job.
+    """
+    ranked = sorted(_jobs.values(), key=lambda j: j["order"], reverse=True)
+    if spec in (None, "%", "%%", "%+"):
+        return ranked[0] if ranked else None
+    if spec == "%-":
+        return ranked[1] if len(ranked) > 1 else None
+    spec = spec[1:] if spec.startswith("%") else spec
+    if spec.isdigit():
+        return _jobs.get(int(spec))
+    return next((j for j in ranked if j["command"].startswith(spec)), None)
+
+def _job_or_error(name, args):
+    job = find(args[0] if args else None)
+    if job is None:
+        print(f"crust: {name}: {args[0] if args else 'current'}: no such job", file=sys.stderr)
+    return job
+
+def jobs_builtin(args):
+    """The `jobs` builtin: list the jobs, with process ids when given -l."""
+    notify()
+    for job in sorted(_jobs.values(), key=lambda j: j["id"]):
+        _print(job, show_pid="-l" in args)
+
+def fg(args):
+    """The `fg` builtin: continue a job in the foreground and wait for it."""
+    job = _job_or_error("fg", args)
+    if job is None:
+        return
+    print(job["command"])
+    job["state"] = "Running"
+    _wait_foreground(job["pid"], job["command"], job)
+
+def bg(args):
+    """The `bg` builtin: continue a stopped job in the background."""
+    job = _job_or_error("bg", args)
+    if job is None:
+        return
+    try:
+        os.killpg(job["pid"], signal.SIGCONT)
+    except ProcessLookupError:
+        pass
+    job["state"] = "Running"
+    _touch(job)
+    print(f"[{job['id']}]{_marker(job)} {job['command']} &")
+
+def wait(args):
+    """The `wait` builtin: wait for the given jobs, or all of them, to finish."""
+    targets = [_job_or_error("wait", [spec]) for spec in args] if args else list(_jobs.values())
+    for job in targets:
+        if job is None or job["state"] == "Stopped":
+            continue
+        try:
+            _, status = os.waitpid(job["pid"], os.WUNTRACED)
+        except ChildProcessError:
+            status = None
+        except KeyboardInterrupt:
+            # Stop waiting, the jobs keep running
+            print()
+            return
+        job["state"] = _status(status)[0] if status is not None else "Done"
+        _print(job)
+        if job["state"] != "Stopped":
+            _jobs.pop(job["id"], None)
+
+def parse_kill(args):
+    """`kill` is only a builtin for job specs (kill %1, kill -9 %2); anything else goes to /bin/kill."""
+    if not any(arg.startswith("%") for arg in args):
+        return None
+    return args
+
+def _signal(name):
+    """Return the signal for "9", "KILL" or "SIGKILL", or None."""
+    name = name.upper()
+    try:
+        if name.isdigit():
+            return signal.Signals(int(name))
+        return signal.Signals[name if name.startswith("SIG") else "SIG" + name]
+    except (KeyError, ValueError):
+        return None
+
+def kill(args):
+    """The `kill` builtin: send a signal (TERM by default, -9, -KILL, -s HUP, ...) to jobs."""
+    sig = signal.SIGTERM
+    specs = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-s" and i + 1 < len(args):
+            i += 1
+            arg = "-" + args[i]
+        if arg.startswith("-") and len(arg) > 1:
+            sig = _signal(arg[1:])
+            if sig is None:
+                print(f"crust: kill: {arg[1:]}: invalid signal specification", file=sys.stderr)
+                return
+        else:
+            specs.append(arg)
+        i += 1
+
+    for spec in specs:
+        job = find(spec) if spec.startswith("%") else None
+        try:
+            if job is not None:
+                os.killpg(job["pid"], sig)
+                # A stopped job has to run to act on the signal
+                if job["state"] == "Stopped" and sig not in (signal.SIGKILL, signal.SIGSTOP):
+                    os.killpg(job["pid"], signal.SIGCONT)
+            elif spec.startswith("%"):
+                print(f"crust: kill: {spec}: no such job", file=sys.stderr)
+            else:
+                os.kill(int(spec), sig)
+        except (ProcessLookupError, PermissionError, ValueError) as e:
+            print(f"crust: kill: {spec}: {e}", file=sys.stderr)
+
+def hangup():
+    """Hang up stopped jobs when crust exits; they could never be continued otherwise."""
+    for job in _jobs.values():
+        if job["state"] == "Stopped":
+            try:
+                os.killpg(job["pid"], signal.SIGHUP)
+                os.killpg(job["pid"], signal.SIGCONT)
+            except ProcessLookupError:
+                pass
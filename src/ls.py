@@ -0,0 +1,176 @@
+import fnmatch
+import getopt
+import os
+import time
+
+import base
+
+# The `ls` builtin. One os.scandir pass gives names and types for free and at most one stat per
+# entry (DirEntry caches it). Small listings are one table; big ones are printed PAGE_SIZE rows
+# at a time, and with -U rows are streamed straight from scandir, so memory does not grow with the
+# directory. Sorted listings keep one small tuple per entry, never a whole table. In a pipeline the
+# same entries are yielded as plain names, or text rows with -l (see rows).
+
+PAGE_SIZE = 500
+# Listings up to this size get lines between rows, like the original table
+SMALL = 200
+OPTIONS = "alhStrU"
+# Anything that needs a real shell goes to bash instead
+SHELL_CHARS = set("|&;<>$`()")
+
+def parse_args(args):
+    """
+    Parse `ls` arguments.
+
+    Returns:
+        dict | None: The options, or None when they need bash (unknown flags, pipes, redirections).
+    """
+    if any(c in SHELL_CHARS for arg in args for c in arg):
+        return None
+    try:
+        flags, rest = getopt.getopt(args, OPTIONS)
+    except getopt.GetoptError:
+        return None
+    if len(rest) > 1:
+        return None
+
+    opts = {flag[1]: True for flag, _ in flags}
+    directory, pattern = ".", None
+    opts["target"] = rest[0] if rest else "."
+    if rest:
+        target = os.path.expanduser(rest[0])
+        if os.path.isdir(target):
+            directory = target
+        else:
+            directory, pattern = os.path.split(target)
+            directory = directory or "."
+    opts["directory"] = directory
+    opts["pattern"] = pattern
+    return opts
+
+def human_size(size):
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+def _open(opts):
+    """
+    Return os.scandir of the directory to list.
+
+    Raises:
+        OSError: "cannot access 'PATH': REASON", like ls, when the directory cannot be read or a
+            named file (not a pattern) does not exist.
+    """
+    pattern = opts["pattern"]
+    try:
+        if pattern is not None and not any(c in pattern for c in "*?["):
+            os.lstat(os.path.join(opts["directory"], pattern))
+        return os.scandir(opts["directory"])
+    except OSError as e:
+        raise OSError(f"cannot access '{opts['target']}': {e.strerror}") from e
+
+def _entries(opts):
+    """Yield (name, is_dir, size, mtime) for the entries of the directory, one scandir pass."""
+    show_hidden = opts.get("a")
+    pattern = opts["pattern"]
+    with _open(opts) as entries:
+        for entry in entries:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            if pattern and not fnmatch.fnmatch(entry.name, pattern):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                st = entry.stat()
+            except OSError:
+                # Broken symlink: describe the link itself
+                is_dir = False
+                st = entry.stat(follow_symlinks=False)
+            yield entry.name, is_dir, st.st_size, st.st_mtime
+
+def _new_table(title, show_lines):
+    table = base.Table(title=title, show_lines=show_lines)
+    table.add_column("󰈔 Name", style="cyan")
+    table.add_column("󰊢 Type", style="magenta")
+    table.add_column("󰍛 Size", style="green")
+    table.add_column("󰥔 Modified", style="yellow")
+    return table
+
+def _row(entry, human):
+    name, is_dir, size, mtime = entry
+    if is_dir:
+        return name, " Directory", "-", time.ctime(mtime)
+    return name, " File", human_size(size) if human else f"{size} bytes", time.ctime(mtime)
+
+def _print_pages(rows, human, show_lines):
+    """Print `rows` as tables of at most PAGE_SIZE rows, building only one page at a time."""
+    title = "󰉋 Directory Listing"
+    table = None
+    count = 0
+    for entry in rows:
+        if table is None:
+            table = _new_table(title, show_lines)
+            title = None
+        table.add_row(*_row(entry, human))
+        count += 1
+        if count % PAGE_SIZE == 0:
+            base.console.print(table)
+            table = None
+    if table is not None:
+        base.console.print(table)
+    elif count == 0:
+        base.console.print(_new_table(title, show_lines))
+    return count
+
+def _sorted(opts):
+    entries = list(_entries(opts))
+    # Name order first, so ties in size or time stay alphabetical
+    entries.sort(key=lambda e: e[0].lower())
+    if opts.get("S"):
+        entries.sort(key=lambda e: e[2], reverse=True)
+    elif opts.get("t"):
+        entries.sort(key=lambda e: e[3], reverse=True)
+    if opts.get("r"):
+        entries.reverse()
+    return entries
+
+def rows(opts, lines=None):
+    """
+    Yield the listing for a pipeline, one name per line like the system `ls`, so `ls | xargs rm` gets
+    file names. With -l each line is tab separated: name, "directory" or "file", size and modification
+    time. With -U entries are yielded as scandir finds them.
+    A path that cannot be listed raises OSError, which fails the pipeline.
+    """
+    entries = _entries(opts) if opts.get("U") else _sorted(opts)
+    for name, is_dir, size, mtime in entries:
+        if not opts.get("l"):
+            yield name
+            continue
+        size = human_size(size) if opts.get("h") else str(size)
+        modified = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime))
+        yield "\t".join((name, "directory" if is_dir else "file", size, modified))
+
+def main(opts):
+    """
+    List a directory as a table.
+
+    Parameters:
+        opts (dict): Options from parse_args. -a shows hidden entries, -h human-readable sizes,
+            -S sorts by size and -t by modification time (largest/newest first), -r reverses,
+            -U streams entries unsorted as they are read. The default is sorted by name.
+    """
+    human = opts.get("h")
+    try:
+        if opts.get("U"):
+            # Fail before the table's title is printed
+            _open(opts).close()
+            _print_pages(_entries(opts), human, show_lines=False)
+            return
+
+        entries = _sorted(opts)
+        _print_pages(entries, human, show_lines=len(entries) <= SMALL)
+    except OSError as e:
+        base.console.print(f"󰅚 ls: {e}", style="bold red", highlight=False)
+    except Exception as e:
+        base.console.print(f"󰅚 Error listing directory: {e}", style="bold red")
@@ -0,0 +1,186 @@
+import os
+import subprocess
+import sys
+import threading
+
+import builtin_registry
+import direct_exec
+
+# Pipelines that mix crust builtins with external commands, e.g. `ls -U | grep foo` or
+# `cat names.txt | capk -f - | sort`. Every stage is connected to the next with an OS pipe: external
+# commands read and write the pipe fds directly, and a builtin runs in a thread, iterating over its
+# input pipe line by line and writing each row its rows() generator yields as soon as it is made.
+# Nothing holds a whole stage's output, so memory stays flat however much data goes through.
+# Lines without a builtin stage, or with other shell syntax (&&, ;, &, subshells), are left to bash.
+
+# Unquoted characters that make a line bash's business
+SHELL_OPERATORS = set(";&()\n")
+
+def split(line):
+    """
+    Split `line` at its unquoted `|` characters.
+
+    Returns:
+        list | None: The stages, or None when the line is not a plain pipeline (no pipe, ||, |&,
+            other operators, an empty stage or an unterminated quote).
+    """
+    stages = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if quote:
+            if c == quote:
+                quote = None
+            elif c == "\\" and quote == '"' and i + 1 < len(line):
+                current.append(c)
+                i += 1
+                c = line[i]
+        elif c in "'\"":
+            quote = c
+        elif c == "\\" and i + 1 < len(line):
+            current.append(c)
+            i += 1
+            c = line[i]
+        elif c == "|":
+            if line[i + 1:i + 2] in ("|", "&"):
+                return None
+            stages.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        elif c in SHELL_OPERATORS:
+            return None
+        current.append(c)
+        i += 1
+
+    if quote:
+        return None
+    stages.append("".join(current).strip())
+    if len(stages) < 2 or not all(stages):
+        return None
+    return stages
+
+def _plan(stages):
+    """
+    Work out how to run each stage: ("builtin", name, rows, args) or ("external", argv, executable).
+
+    Returns:
+        list | int | None: The plan, None when no stage is a builtin, or an exit status when the
+            pipeline cannot run (a builtin without pipeline support, a missing program).
+    """
+    plan = []
+    for text in stages:
+        builtin, args = builtin_registry.lookup(text)
+        if builtin is not None:
+            rows = builtin_registry.rows(builtin)
+            if rows is None:
+                print(f"crust: {builtin['name']}: cannot be used in a pipeline", file=sys.stderr)
+                return 1
+            args = builtin_registry.arguments(builtin, args)
+            # A builtin that needs bash for these arguments runs as the external program instead
+            if args is not None:
+                plan.append(("builtin", builtin["name"], rows, args))
+                continue
+        plan.append(("external", text))
+
+    if not any(stage[0] == "builtin" for stage in plan):
+        return None
+    # Report a missing program before anything is started
+    for i, stage in enumerate(plan):
+        if stage[0] == "external":
+            command = direct_exec.resolve(stage[1])
+            if command is None:
+                return 127
+            plan[i] = ("external",) + command
+    return plan
+
+def _pump(name, rows, args, in_fd, out_fd, errors, stop):
+    """
+    Run a builtin stage: feed it the lines of `in_fd` and write its rows to `out_fd` (stdout if None),
+    until it is done or `stop` is set.
+    """
+    source = os.fdopen(in_fd, "r", errors="replace") if in_fd is not None else None
+    sink = os.fdopen(out_fd, "w") if out_fd is not None else sys.stdout
+    try:
+        lines = (line.rstrip("\n") for line in source) if source is not None else None
+        for row in rows(args, lines):
+            if stop.is_set():
+                break
+            sink.write(row + "\n")
+        sink.flush()
+    except BrokenPipeError:
+        # The next stage stopped reading (e.g. head); so do we
+        pass
+    except Exception as e:
+        errors.append(e)
+        print(f"crust: {name}: {e}", file=sys.stderr)
+    finally:
+        if source is not None:
+            source.close()
+        if sink is not sys.stdout:
+            try:
+                sink.close()
+            except BrokenPipeError:
+                pass
+
+def _execute(plan):
+    processes = []
+    threads = []
+    errors = []
+    stop = threading.Event()
+    last = None
+    previous = None
+    try:
+        for i, stage in enumerate(plan):
+            read_fd, write_fd = os.pipe() if i < len(plan) - 1 else (None, None)
+            if stage[0] == "external":
+                _, argv, executable = stage
+                process = subprocess.Popen(argv, executable=executable, stdin=previous, stdout=write_fd)
+                processes.append(process)
+                last = process
+                # The child has its own copies now
+                if previous is not None:
+                    os.close(previous)
+                if write_fd is not None:
+                    os.close(write_fd)
+            else:
+                _, name, rows, args = stage
+                thread = threading.Thread(target=_pump, args=(name, rows, args, previous, write_fd, errors, stop), daemon=True)
+                thread.start()
+                threads.append(thread)
+                last = thread
+            previous = read_fd
+
+        for thread in threads:
+            thread.join()
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        stop.set()
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+        print()
+        return 130
+
+    # A builtin stage that failed fails the pipeline, wherever it is
+    status = direct_exec.exit_status(last.returncode) if isinstance(last, subprocess.Popen) else 0
+    return status or (1 if errors else 0)
+
+def run(line):
+    """
+    Run `line` when it is a pipeline with at least one builtin in it.
+
+    Returns:
+        int | None: The exit status of the last stage, or None when the line is not such a pipeline
+            and should run as usual.
+    """
+    stages = split(line)
+    if stages is None:
+        return None
+    plan = _plan(stages)
+    if plan is None or isinstance(plan, int):
+        return plan
+    return _execute(plan)
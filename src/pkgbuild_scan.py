@@ -0,0 +1,240 @@
+import re
+import shlex
+from urllib.parse import urlparse
+
+from rich.markup import escape
+
+import base
+
+# Rule-based scanner for PKGBUILDs and their install scripts, used by aur_check. It flags the patterns
+# AUR malware tends to use (a download piped into a shell, decoded payloads, sources on raw IPs or
+# throwaway hosts, checksums switched off, a -bin package fetching its binary from an unknown host)
+# in a few milliseconds and without any network. Only packages it finds something in go to the model.
+#
+# Every line is checked with COMMAND_RULES after comments are removed, and the PKGBUILD is tokenized
+# with shlex so the source and checksum arrays and the install script can be read out of it.
+
+SEVERITIES = ("low", "medium", "high", "critical")
+SEVERITY_STYLES = {"low": "cyan", "medium": "yellow", "high": "red", "critical": "bold white on red"}
+# Findings from this severity up are worth a closer look by the model
+ESCALATE = "medium"
+
+_SHELL = r"(?:sudo\s+)?(?:/usr)?(?:/bin/)?(?:ba|z|da|k|fi)?sh\b|\bpython[0-9.]*\b|\bperl\b|\bruby\b"
+_DOWNLOAD = r"\b(?:curl|wget|fetch|aria2c)\b"
+_DECODE = r"\bbase64\s+(?:-\w*d\w*|--decode)\b|\bopenssl\s+(?:enc\s+)?(?:-\w+\s+)*-d\b|\bxxd\s+-r\b"
+
+# (rule id, severity, description, pattern), checked against every line without its comments
+COMMAND_RULES = (
+    ("download-to-shell", "critical", "downloaded code is run by a shell",
+     re.compile(rf"{_DOWNLOAD}[^|;&]*\|\s*(?:{_SHELL})|(?:{_SHELL})\s+(?:-c\s+)?[\"']?(?:\$\(|<\(|`)\s*{_DOWNLOAD}")),
+    ("decode-to-shell", "critical", "a decoded payload is run by a shell",
+     re.compile(rf"(?:{_DECODE})[^;&]*\|\s*(?:{_SHELL})")),
+    ("reverse-shell", "critical", "opens a shell over the network",
+     re.compile(r"/dev/tcp/|/dev/udp/|\bnc(?:at)?\b[^|;&]*\s-[ec]\b|\bsocat\b[^|;&]*\bexec:")),
+    ("decode", "high", "decodes an encoded payload", re.compile(_DECODE)),
+    ("eval", "high", "evaluates generated code", re.compile(r"\beval\s+[\"']?(?:\$\(|`|\$\{?\w)")),
+    ("paste-host", "high", "uses a paste site, URL shortener or chat webhook",
+     re.compile(r"\b(?:pastebin\.com|paste\.ee|hastebin\.com|transfer\.sh|0x0\.st|bit\.ly|tinyurl\.com|"
+                r"is\.gd|t\.co|discord(?:app)?\.com/api/webhooks|api\.telegram\.org)\b")),
+    ("shell-startup", "high", "changes shell startup files, sudoers or scheduled jobs",
+     re.compile(r"(?:>>?|\btee\b[^|;&]*)\s*\S*(?:\.bashrc|\.zshrc|\.profile|/etc/profile|/etc/sudoers|/etc/cron|/etc/ld\.so\.preload)|\bcrontab\b")),
+    ("setuid", "medium", "makes a file setuid or setgid", re.compile(r"\bchmod\s+(?:-\w+\s+)*(?:[ugoa]*\+[rwx]*s|[2467][0-7]{3})\b")),
+)
+
+# Downloads of the package itself that are fine in a PKGBUILD, but not in an install script
+INSTALL_DOWNLOAD = re.compile(_DOWNLOAD)
+
+# Hosts a -bin package can take its binary from without raising an eyebrow
+KNOWN_HOSTS = (
+    "github.com", "githubusercontent.com", "gitlab.com", "codeberg.org", "sourceforge.net", "bitbucket.org",
+    "archlinux.org", "debian.org", "ubuntu.com", "fedoraproject.org", "launchpad.net", "kde.org", "gnome.org",
+    "mozilla.org", "google.com", "microsoft.com", "jetbrains.com", "pypi.org", "pythonhosted.org",
+    "npmjs.org", "crates.io", "golang.org", "electronjs.org",
+)
+
+IP_HOST = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$|^\[[0-9a-fA-F:]+\]$")
+VCS_PREFIXES = ("git+", "git://", "hg+", "svn+", "bzr+", "fossil+")
+CHECKSUM_ARRAYS = ("sha256sums", "sha512sums", "sha1sums", "sha224sums", "sha384sums", "b2sums", "md5sums", "cksums")
+
+def strip_comment(line):
+    """Remove the comment from a line of shell, leaving `#` inside quotes and words (url#fragment) alone."""
+    quote = None
+    for i, c in enumerate(line):
+        if quote:
+            if c == quote:
+                quote = None
+            elif c == "\\" and quote == '"':
+                continue
+        elif c in "'\"":
+            quote = c
+        elif c == "#" and (i == 0 or line[i - 1] in " \t;|&("):
+            return line[:i]
+    return line
+
+def tokens(text):
+    """
+    Tokenize shell text: words with their quotes removed, and |, &, ;, (, ) and redirections as tokens
+    of their own. Falls back to splitting on whitespace when the quoting is unbalanced.
+    """
+    text = "\n".join(strip_comment(line) for line in text.splitlines())
+    lexer = shlex.shlex(text, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    try:
+        return list(lexer)
+    except ValueError:
+        return re.findall(r"[()|;&<>]|[^\s()|;&<>]+", text)
+
+def _expand(value, variables):
+    return re.sub(r"\$\{?(\w+)\}?", lambda m: variables.get(m.group(1), m.group(0)), value)
+
+def parse(text):
+    """
+    Read the variables and arrays assigned in a PKGBUILD, e.g. {"pkgname": ["foo-bin"], "source": [...]}.
+    Simple $var and ${var} references to earlier assignments are expanded.
+    """
+    found = {}
+    words = tokens(text)
+    i = 0
+    while i < len(words):
+        name, sep, value = words[i].partition("=")
+        if sep and re.fullmatch(r"\w+(?:_\w+)*", name):
+            if not value and i + 1 < len(words) and words[i + 1] == "(":
+                values = []
+                i += 2
+                while i < len(words) and words[i] != ")":
+                    values.append(words[i])
+                    i += 1
+                found[name] = values
+            else:
+                found[name] = [value]
+            scalars = {key: values[0] for key, values in found.items() if len(values) == 1}
+            found[name] = [_expand(v, scalars) for v in found[name]]
+        i += 1
+    return found
+
+def _url(source):
+    # source entries look like "name::url" or just "url"; VCS ones are prefixed with git+ and the like
+    url = source.split("::", 1)[-1]
+    for prefix in VCS_PREFIXES:
+        if url.startswith(prefix):
+            return url[len(prefix):] if prefix.endswith("+") else url, True
+    return url, False
+
+def _known(host):
+    return any(host == known or host.endswith("." + known) for known in KNOWN_HOSTS)
+
+def _finding(severity, rule, description, file, line, text):
+    return {"severity": severity, "rule": rule, "description": description, "file": file, "line": line, "text": text.strip()[:120]}
+
+def scan_text(text, file, install_script=False):
+    """Check every line of `text` against COMMAND_RULES (and, in install scripts, for downloads)."""
+    findings = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = strip_comment(line)
+        matched = set()
+        for rule, severity, description, pattern in COMMAND_RULES:
+            if pattern.search(line):
+                # A line that runs decoded or downloaded code is reported once, at its worst
+                if rule == "decode" and "decode-to-shell" in matched:
+                    continue
+                matched.add(rule)
+                findings.append(_finding(severity, rule, description, file, number, line))
+        if install_script and not matched & {"download-to-shell"} and INSTALL_DOWNLOAD.search(line):
+            findings.append(_finding("high", "install-download", "downloads something while the package is installed", file, number, line))
+    return findings
+
+def scan_sources(pkgbuild, package=None):
+    """Check the source array and its checksums."""
+    fields = parse(pkgbuild)
+    package = package or (fields.get("pkgname") or [""])[0]
+    findings = []
+
+    def where(url):
+        # The line the source is on; sources built from ${variables} are found by their host
+        host = urlparse(url).netloc
+        for needle in (url, host):
+            for number, line in enumerate(pkgbuild.splitlines(), 1):
+                if needle and needle in line:
+                    return number, line
+        return 0, url
+
+    sources = [value for name, values in fields.items() if name == "source" or name.startswith("source_") for value in values]
+    remote = False
+    for source in sources:
+        url, vcs = _url(source)
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https", "ftp"):
+            continue
+        remote = True
+        host = (parsed.hostname or "").lower()
+        number, line = where(url)
+        if IP_HOST.match(host) or IP_HOST.match(parsed.netloc.split(":")[0]):
+            findings.append(_finding("high", "ip-source", "a source is downloaded from a bare IP address", "PKGBUILD", number, line))
+        elif package.endswith("-bin") and not vcs and not _known(host):
+            findings.append(_finding("medium", "unknown-binary-host", f"the binary comes from an unknown host ({host})", "PKGBUILD", number, line))
+        if parsed.scheme in ("http", "ftp"):
+            findings.append(_finding("low", "insecure-source", "a source is downloaded without TLS", "PKGBUILD", number, line))
+
+    sums = {name: values for name, values in fields.items() if name.partition("_")[0] in CHECKSUM_ARRAYS}
+    if remote and not sums:
+        findings.append(_finding("medium", "no-checksums", "the sources have no checksums", "PKGBUILD", 0, ""))
+    for name, values in sums.items():
+        # sha256sums_x86_64 goes with source_x86_64
+        suffix = name.partition("_")[2]
+        for source, value in zip(fields.get("source_" + suffix if suffix else "source", []), values):
+            url, vcs = _url(source)
+            # SKIP is normal for VCS sources, whose checksum cannot be known, but not for downloaded files
+            if value == "SKIP" and not vcs and urlparse(url).scheme in ("http", "https", "ftp"):
+                number, line = where(url)
+                findings.append(_finding("medium", "skipped-checksum", "a downloaded file is not checksummed (SKIP)", "PKGBUILD", number, line))
+    return findings
+
+def install_scripts(pkgbuild):
+    """Return the install scripts the PKGBUILD names (install=...)."""
+    return [name for name in parse(pkgbuild).get("install", []) if name]
+
+def scan(files, package=None):
+    """
+    Scan a package.
+
+    Parameters:
+        files (dict): File name -> text; "PKGBUILD" and any install scripts.
+        package (str | None): The package name, taken from the PKGBUILD when not given.
+
+    Returns:
+        list: Findings, most severe first. Each is a dict with severity, rule, description, file, line and text.
+    """
+    pkgbuild = files.get("PKGBUILD", "")
+    scripts = set(install_scripts(pkgbuild))
+    findings = scan_sources(pkgbuild, package)
+    for name, text in files.items():
+        findings += scan_text(text, name, install_script=name in scripts)
+    findings.sort(key=lambda f: (-SEVERITIES.index(f["severity"]), f["file"] != "PKGBUILD", f["line"]))
+    return findings
+
+def worst(findings):
+    """The highest severity among `findings`, or None."""
+    return findings[0]["severity"] if findings else None
+
+def escalate(findings):
+    """True when the findings are worth asking the model about."""
+    return any(SEVERITIES.index(f["severity"]) >= SEVERITIES.index(ESCALATE) for f in findings)
+
+def describe(findings):
+    """The findings as text for the model's prompt."""
+    return "\n".join(f"- {f['severity']}: {f['description']} ({f['file']}:{f['line']}: {f['text']})" for f in findings)
+
+def print_findings(package, findings):
+    if not findings:
+        base.console.print(f"[green]{package}: no suspicious patterns found.[/green]")
+        return
+    table = base.Table(title=f"{package}: static scan", show_lines=False)
+    table.add_column("Severity", no_wrap=True)
+    table.add_column("Where", style="cyan", no_wrap=True)
+    table.add_column("Finding")
+    for f in findings:
+        style = SEVERITY_STYLES[f["severity"]]
+        where = f"{f['file']}:{f['line']}" if f["line"] else f["file"]
+        table.add_row(f"[{style}]{f['severity']}[/{style}]", where, f"{f['description']}\n[dim]{escape(f['text'])}[/dim]" if f["text"] else f["description"])
+    base.console.print(table)
@@ -0,0 +1,141 @@
+import subprocess
+
+import ai_stream
+import base
+import config_manager
+import sysinfo
+
+# The `.question` builtin: chat with the assistant, which can run commands and read or edit files
+# after asking. The client and the conversation are kept for the whole session.
+
+_state = {"client": None, "history": None}
+
+def _client(key):
+    if _state["client"] is not None:
+        base.console.print("[yellow]Skipping creation of the Cohere client.[/yellow]")
+        return _state["client"]
+
+    base.console.print("[bold green]Creating a new Cohere client...[/bold green]")
+    co = ai_stream.client(key)
+
+    base.console.print("[cyan]Giving a description of the system to the AI, so it can understand it.[/cyan]")
+    os_info = sysinfo.describe()
+
+    base.console.print("[cyan]Giving extra info to the AI...[/cyan]")
+    _state["history"] = [{
+        "role": "SYSTEM",
+        "message": (
+            "you are an integrated assistant in a linux shell called crust. if .question gets in to the prompt, its normal, that is the command to ask a question."
+            "to execute commands, write `.execute-command` before it. do not put the ` there. after every `.execute-command`,create a new line and put this in it:\n"
+            ":The assistant is sometimes buggy when executing, and may hallucinate from the knowledge base.:\n"
+            "If the user gives the output of a command you asked to execute, do not ask to execute it again. Instead, reason from the output they gave."
+            "prefer executing it like this instead of telling the user to execute it themselves. you ARE ABLE TO EXECUTE COMMANDS. "
+            "IF YOU ARE ASKED FOR A COMMAND, EXECUTE IT LIKE THAT. YOU CAN EXECUTE COMMANDS. JUST EXECUTE WITHOUT ANYTHING SAID. "
+            "YOU AREN'T A TEXT-BASED AI ONLY, THE SHELL IS INTEGRATED WITH YOU. DO NOT PRETEND TO EXECUTE. "
+            "THE COMMANDS WILL GET EXECUTED IN THE BACKEND AFTER SCANNING FOR EXECUTING COMMANDS BY YOU.\n\n"
+
+            "To modify files, use `.edit-file /path/to/file` followed by the full content you want to write to the file. "
+            "Do NOT describe the change in words — just show the updated contents. "
+            "Only start the new content after the `.edit-file` line. You can edit scripts, config files, or create new ones. "
+            "Assume full permission to overwrite them, unless told otherwise.\n\n"
+
+            "To view a file, use `.read-file /path/to/file`. This will return the file contents to you in the next message. "
+            "Only request one file per `.read-file` line.\n\n"
+
+            "The text you say is viewed as plain text, so don't use markdown or any similar formatting. "
+            "THIS MESSAGE IS NOT SENT BY THE USER.\n\n"
+
+            "For showing accurate information, here is a description of the system. Use it when asked for system specs and similar:\n"
+            + os_info
+        )
+    }]
+    _state["client"] = co
+    return co
+
+def main(args):
+    """
+    Ask the assistant a question and act on the commands, file edits and file reads in its answer.
+
+    Parameters:
+        args (list): The words of the question.
+    """
+    configs = config_manager.folder()
+    if configs is None:
+        print("No configuration.")
+        return
+    with open(configs + "/cohere-api-key.txt", "r") as f:
+        key = f.read().strip()
+
+    co = _client(key)
+    chat_history = _state["history"]
+    prompt = " ".join([".question"] + args)
+
+    base.console.print("[blue]Processing prompt (1/2)...[/blue]")
+    chat_history.append({"role": "USER", "message": prompt})
+
+    base.console.print("[blue]Processing prompt (2/2)...[/blue]")
+    base.console.print("[bold cyan]AI Response:[/bold cyan]")
+    # Directives are acted on as soon as their line has streamed in; the rest keeps generating meanwhile
+    lines = ai_stream.lines(co, message=prompt, chat_history=chat_history)
+    line = next(lines, None)
+    while line is not None:
+        if line.startswith(".execute-command"):
+            command = line.replace(".execute-command", "").strip()
+
+            base.console.print("[magenta on white]Found an execution of a command in the response[/magenta on white]")
+            base.console.print(f"[bold green]OK if I execute this command? yes/no:[/bold green] [white]{command}[/white]")
+            exec_it = input()
+            if exec_it == "yes":
+                try:
+                    output = subprocess.check_output(command, shell=True, stderr=subprocess.STDOUT, text=True)
+                except subprocess.CalledProcessError as e:
+                    output = e.output
+
+                base.console.print(f"[green]Command output:[/green]\n{output}")
+                chat_history.append({
+                    "role": "USER",
+                    "message": f"The command `{command}` has already been executed. Here's the result:\n{output}"
+                })
+                base.console.print("[yellow]Sending command output back to AI...[/yellow]")
+
+                base.console.print("[bold cyan]New AI Response:[/bold cyan]")
+                ai_stream.text(co, message=prompt, chat_history=chat_history)
+
+        elif line.startswith(".edit-file"):
+            filepath = line.replace(".edit-file", "").strip()
+            base.console.print(f"[magenta on white]Found a file edit request for:[/magenta on white] [bold]{filepath}[/bold]")
+            file_lines = []
+
+            line = next(lines, None)
+            while line is not None and not line.startswith("."):
+                file_lines.append(line)
+                line = next(lines, None)
+
+            file_content = "\n".join(file_lines)
+            base.console.print(f"[bold green]OK if I overwrite this file? yes/no:[/bold green] [white]{filepath}[/white]")
+            exec_it = input()
+            if exec_it == "yes":
+                with open(filepath, "w") as f:
+                    f.write(file_content)
+                base.console.print(f"[green]File {filepath} written.[/green]")
+            # `line` is the directive after the file, if any
+            continue
+
+        elif line.startswith(".read-file"):
+            filepath = line.replace(".read-file", "").strip()
+            base.console.print(f"[bold cyan]AI requested to read file:[/bold cyan] {filepath}")
+            try:
+                with open(filepath, "r") as f:
+                    file_contents = f.read()
+                base.console.print("[green]Sending file contents back to AI...[/green]")
+
+                chat_history.append({"role": "USER", "message": f"Contents of `{filepath}`:\n{file_contents}"})
+                base.console.print("[yellow]Re-querying AI with file contents...[/yellow]")
+                base.console.print("[bold cyan]New AI Response:[/bold cyan]")
+                ai_stream.text(co, message=prompt, chat_history=chat_history)
+                break
+
+            except Exception as e:
+                base.console.print(f"[red]Could not read file {filepath}: {e}[/red]")
+
+        line = next(lines, None)
@@ -0,0 +1,70 @@
+import mmap
+import os
+
+# Helpers for sorted, newline separated text files that are searched in place through mmap.
+# Used by the capk offline indexes and the command-not-found index.
+
+_maps = {}
+
+def write(path, lines):
+    """Write `lines` (bytes, without newlines) to `path` sorted and de-duplicated, replacing it atomically."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        for line in sorted(set(lines)):
+            if line:
+                f.write(line + b"\n")
+    os.replace(tmp, path)
+
+def open_map(path):
+    """Return a read-only mmap of `path`, reused until the file changes. None if it is missing or empty."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if st.st_size == 0:
+        return None
+
+    cached = _maps.get(path)
+    if cached and cached[0] == st.st_mtime_ns:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _maps[path] = (st.st_mtime_ns, mm)
+    return mm
+
+def line_at(mm, pos):
+    """Return (start, end) offsets of the line containing `pos`."""
+    start = mm.rfind(b"\n", 0, pos) + 1
+    end = mm.find(b"\n", start)
+    if end == -1:
+        end = len(mm)
+    return start, end
+
+def bisect(mm, key):
+    """Return the offset of the first line that is >= `key`."""
+    lo, hi = 0, len(mm)
+    while lo < hi:
+        start, end = line_at(mm, (lo + hi) // 2)
+        if mm[start:end] < key:
+            lo = end + 1
+        else:
+            hi = start
+    return lo
+
+def lines_from(mm, pos, stop=None):
+    """Yield the lines from offset `pos` up to offset `stop` (end of file by default)."""
+    stop = len(mm) if stop is None else stop
+    while pos < stop:
+        start, end = line_at(mm, pos)
+        yield mm[start:end]
+        pos = end + 1
+
+def prefixed(mm, prefix):
+    """Yield every line starting with `prefix`."""
+    for line in lines_from(mm, bisect(mm, prefix)):
+        if not line.startswith(prefix):
+            break
+        yield line
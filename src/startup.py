@@ -0,0 +1,116 @@
+import builtins
+import importlib.util
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Startup helpers: lazy module loading and the timings behind `crust --profile-startup`.
+# Import this before anything else in main.py so START is as early as possible.
+
+START = time.perf_counter()
+PROFILE_FLAG = "--profile-startup"
+
+phases = []
+imports = []
+
+_original_import = builtins.__import__
+_pending = []
+
+def lazy_import(name):
+    """
+    Return module `name` without executing it yet; it is loaded on first attribute access.
+
+    Used for builtins and heavy dependencies (cohere, requests) that most sessions never touch.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+@contextmanager
+def phase(name):
+    """Record how long the block takes as a startup phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.append((name, time.perf_counter() - start))
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level == 0 and name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    start = time.perf_counter()
+    _pending.append(0.0)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        total = time.perf_counter() - start
+        nested = _pending.pop()
+        if _pending:
+            _pending[-1] += total
+        if level:
+            # Relative import, e.g. `from .text import Text` inside rich
+            name = "." * level + (name or ", ".join(fromlist or ()))
+        imports.append((name, len(_pending), total - nested, total))
+
+def profiling():
+    return PROFILE_FLAG in sys.argv[1:]
+
+def enable_import_timing():
+    """Time every import from now on. Only done for --profile-startup, it slows imports down slightly."""
+    builtins.__import__ = _timed_import
+
+def disable_import_timing():
+    builtins.__import__ = _original_import
+
+def _log_path():
+    import config_find
+    return config_find.cache_file("startup-times.txt")
+
+def report(limit=15):
+    """Print the startup phases, the slowest imports, and time-to-first-prompt compared with earlier runs."""
+    import base
+
+    total = time.perf_counter() - START
+
+    table = base.Table(title="Startup phases")
+    table.add_column("Phase", style="cyan")
+    table.add_column("ms", justify="right", style="green")
+    for name, seconds in phases:
+        table.add_row(name, f"{seconds * 1000:.1f}")
+    table.add_row("[bold]time to first prompt[/]", f"[bold]{total * 1000:.1f}[/]")
+    base.console.print(table)
+
+    if imports:
+        table = base.Table(title=f"Slowest imports (top {limit})")
+        table.add_column("Module", style="cyan")
+        table.add_column("self ms", justify="right", style="green")
+        table.add_column("total ms", justify="right", style="yellow")
+        for name, depth, self_time, cumulative in sorted(imports, key=lambda i: i[3], reverse=True)[:limit]:
+            table.add_row("  " * depth + name, f"{self_time * 1000:.1f}", f"{cumulative * 1000:.1f}")
+        base.console.print(table)
+
+    # Keep a history of runs so regressions show up
+    path = _log_path()
+    if path:
+        previous = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                previous = f.read().splitlines()[-5:]
+        with open(path, "a") as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{total * 1000:.1f}\n")
+        if previous:
+            base.console.print("Previous runs (ms to first prompt):")
+            for line in previous:
+                when, ms = line.split("\t")
+                base.console.print(f"  {when}  {ms}")
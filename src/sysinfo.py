@@ -0,0 +1,159 @@
+import os
+import platform
+import shutil
+import threading
+import time
+
+import base
+
+# A snapshot of the system (distro, kernel, CPU, memory, shell, package managers) read in-process from
+# /etc/os-release, /proc and os.uname. It is collected once in the background at startup and refreshed
+# after REFRESH seconds, and every AI prompt describes the system from it instead of running neofetch
+# or cat. Also the `sysinfo` builtin.
+
+OS_RELEASE = ("/etc/os-release", "/usr/lib/os-release")
+PROC = "/proc"
+# Seconds a snapshot is used before it is collected again (memory and uptime change)
+REFRESH = 5 * 60
+
+PACKAGE_MANAGERS = (
+    "pacman", "yay", "paru", "apt", "dnf", "yum", "zypper", "apk", "xbps-install", "emerge", "nix",
+    "flatpak", "snap", "brew", "car",
+)
+
+_state = {"snapshot": None, "time": 0, "thread": None}
+_lock = threading.Lock()
+
+def os_release(paths=None):
+    """Return the fields of os-release as a dict, with the quotes removed."""
+    for path in paths or OS_RELEASE:
+        try:
+            with open(path, "r") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        fields = {}
+        for line in lines:
+            key, sep, value = line.partition("=")
+            if sep and not key.startswith("#"):
+                fields[key.strip()] = value.strip().strip("\"'")
+        return fields
+    return {}
+
+def _proc_fields(name, separator=":"):
+    fields = {}
+    try:
+        with open(os.path.join(PROC, name), "r") as f:
+            for line in f:
+                key, sep, value = line.partition(separator)
+                if sep and key.strip() not in fields:
+                    fields[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return fields
+
+def _kib(value):
+    # /proc/meminfo values look like "16318412 kB"
+    try:
+        return int(value.split()[0]) * 1024
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def _gib(size):
+    return f"{size / 1024 ** 3:.1f} GiB" if size is not None else None
+
+def _uptime():
+    try:
+        with open(os.path.join(PROC, "uptime"), "r") as f:
+            seconds = int(float(f.read().split()[0]))
+    except (OSError, ValueError, IndexError):
+        return None
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    return (f"{days}d " if days else "") + f"{hours}h {seconds // 60}m"
+
+def collect():
+    """
+    Read a fresh snapshot.
+
+    Returns:
+        dict: Label -> value, in display order. Facts that cannot be read are left out.
+    """
+    release = os_release()
+    uname = os.uname()
+    cpu = _proc_fields("cpuinfo")
+    memory = _proc_fields("meminfo")
+    total, available = _kib(memory.get("MemTotal")), _kib(memory.get("MemAvailable"))
+
+    info = {
+        "OS": release.get("PRETTY_NAME") or release.get("NAME") or platform.system(),
+        "Distro ID": " ".join(filter(None, (release.get("ID"), release.get("ID_LIKE")))),
+        "Kernel": f"{uname.sysname} {uname.release}",
+        "Architecture": uname.machine,
+        "Host": uname.nodename,
+        "Uptime": _uptime(),
+        "CPU": " ".join(filter(None, (cpu.get("model name") or cpu.get("Hardware"), f"({os.cpu_count()} threads)"))),
+        "Memory": f"{_gib(total - available)} / {_gib(total)}" if total and available is not None else _gib(total),
+        "Shell": f"crust (login shell {os.path.basename(os.environ.get('SHELL', '')) or 'unknown'})",
+        "Terminal": os.environ.get("TERM"),
+        "Desktop": os.environ.get("XDG_CURRENT_DESKTOP") or os.environ.get("DESKTOP_SESSION"),
+        "Package managers": ", ".join(name for name in PACKAGE_MANAGERS if shutil.which(name)),
+        "Python": platform.python_version(),
+    }
+    return {label: value for label, value in info.items() if value}
+
+def _refresh():
+    snapshot = collect()
+    with _lock:
+        _state["snapshot"] = snapshot
+        _state["time"] = time.monotonic()
+        _state["thread"] = None
+
+def start():
+    """Collect a snapshot on a daemon thread, unless one is fresh or already being collected."""
+    with _lock:
+        if _state["thread"] is not None:
+            return
+        if _state["snapshot"] is not None and time.monotonic() - _state["time"] < REFRESH:
+            return
+        _state["thread"] = threading.Thread(target=_refresh, daemon=True, name="sysinfo")
+        _state["thread"].start()
+
+def snapshot(refresh=False):
+    """
+    Return the current snapshot. A stale one is returned right away while a new one is collected in
+    the background; without any snapshot yet this waits for the first one.
+    """
+    if refresh:
+        _refresh()
+    start()
+    with _lock:
+        thread = _state["thread"]
+        current = _state["snapshot"]
+    if current is None and thread is not None:
+        thread.join()
+        current = _state["snapshot"]
+    return current or {}
+
+def describe():
+    """The snapshot as "Label: value" lines, for AI prompts."""
+    return "\n".join(f"{label}: {value}" for label, value in snapshot().items())
+
+def parse_args(args):
+    if args in ([], ["--refresh"]):
+        return {"refresh": bool(args)}
+    return None
+
+def main(opts):
+    """The `sysinfo` builtin: show the snapshot as a table; --refresh collects it again first."""
+    table = base.Table(title="🖥 System", show_header=False, box=None)
+    table.add_column(style="bold salmon1")
+    table.add_column(style="white")
+    for label, value in snapshot(refresh=opts.get("refresh")).items():
+        table.add_row(label, value)
+    base.console.print(table)
+
+def rows(opts, lines=None):
+    """Yield "label<TAB>value" lines for pipelines."""
+    for label, value in snapshot(refresh=opts.get("refresh")).items():
+        yield f"{label}\t{value}"
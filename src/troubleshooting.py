@@ -1,6 +1,7 @@
 import os
 import subprocess
-import cohere
+import ai_stream
+import sysinfo
 from rich.console import Console
 from rich.prompt import Prompt
 
@@ -16,7 +17,7 @@ def load_api_key():
         exit(1)
 
 def init_cohere_client(key):
-    return cohere.Client(key)
+    return ai_stream.client(key)
 
 def build_system_prompt():
     return {
@@ -24,7 +25,8 @@ def build_system_prompt():
         "message": (
             "You are a system troubleshooting assistant. The user will describe a problem. "
             "You can ask for more info, run commands using `.execute-command <cmd>`, read files using `.read-file <path>`, or suggest edits using `.edit-file <path>`.\n"
-            "Every command you give will be executed if the user confirms. Be specific, and try to diagnose and fix system-level issues."
+            "Every command you give will be executed if the user confirms. Be specific, and try to diagnose and fix system-level issues.\n\n"
+            "The system:\n" + sysinfo.describe()
         )
     }
 
@@ -44,14 +46,11 @@ def run():
 
         chat_history.append({"role": "USER", "message": user_input})
         console.print("[green]Sending to AI...[/green]")
-        response = co.chat(message=user_input, chat_history=chat_history)
-        console.print(f"[bold cyan]AI Response:[/bold cyan]\n{response.text}")
-
-        lines = response.text.splitlines()
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-
+        console.print("[bold cyan]AI Response:[/bold cyan]")
+        # Directives are handled as soon as their line arrives, while the rest is still generating
+        lines = ai_stream.lines(co, message=user_input, chat_history=chat_history)
+        line = next(lines, None)
+        while line is not None:
             if line.startswith(".execute-command"):
                 command = line.replace(".execute-command", "").strip()
                 console.print(f"\n[magenta]Run command:[/magenta] [white]{command}[/white]")
@@ -67,10 +66,9 @@ def run():
                         "message": f"The command `{command}` was executed. Output:\n{output}"
                     })
                     # Ask again with new info
-                    response = co.chat(message=user_input, chat_history=chat_history)
-                    console.print(f"[bold cyan]AI Response (follow-up):[/bold cyan]\n{response.text}")
-                    lines = response.text.splitlines()
-                    i = 0
+                    console.print("[bold cyan]AI Response (follow-up):[/bold cyan]")
+                    lines = ai_stream.lines(co, message=user_input, chat_history=chat_history)
+                    line = next(lines, None)
                     continue
 
             elif line.startswith(".read-file"):
@@ -80,21 +78,20 @@ def run():
                         contents = f.read()
                     console.print(f"[yellow]Sent contents of {path} to AI[/yellow]")
                     chat_history.append({"role": "USER", "message": f"Contents of `{path}`:\n{contents}"})
-                    response = co.chat(message=user_input, chat_history=chat_history)
-                    console.print(f"[bold cyan]AI Response (file insight):[/bold cyan]\n{response.text}")
-                    lines = response.text.splitlines()
-                    i = 0
+                    console.print("[bold cyan]AI Response (file insight):[/bold cyan]")
+                    lines = ai_stream.lines(co, message=user_input, chat_history=chat_history)
+                    line = next(lines, None)
                     continue
                 except Exception as e:
                     console.print(f"[red]Could not read file: {e}[/red]")
 
             elif line.startswith(".edit-file"):
                 path = line.replace(".edit-file", "").strip()
-                i += 1
                 file_lines = []
-                while i < len(lines) and not lines[i].startswith("."):
-                    file_lines.append(lines[i])
-                    i += 1
+                line = next(lines, None)
+                while line is not None and not line.startswith("."):
+                    file_lines.append(line)
+                    line = next(lines, None)
                 content = "\n".join(file_lines)
                 console.print(f"[bold magenta]Edit file {path}?[/bold magenta]")
                 confirm = Prompt.ask("[bold green]Confirm overwrite? (yes/no)[/bold green]", default="no")
@@ -104,7 +101,7 @@ def run():
                     console.print(f"[green]File {path} updated.[/green]")
                 continue
 
-            i += 1
+            line = next(lines, None)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,196 @@
+import readline
+import threading
+import time
+
+import builtin_registry
+import completion
+import config_manager
+import direct_exec
+
+# Offline spelling correction for commands that are not found (`gti` -> `git`, `pacamn` -> `pacman`).
+# Every executable on $PATH, the aliases, the crust builtins and the commands used often in the history
+# are indexed by every string made by deleting up to MAX_EDITS of their characters (symmetric delete):
+# the names within one or two edits of a typo are then found with a few dict lookups on the typo's own
+# deletions, instead of comparing it to every name. Transpositions count as one edit. A correction is
+# only offered when one name is clearly the best; otherwise the AI gets to try.
+# The index is rebuilt in the background when PATH, its directories, the aliases, builtins or the set of
+# frequent history commands change.
+
+MAX_EDITS = 2
+# A command has to be this frequent in the history to be indexed from it
+HISTORY_MIN = 3
+
+# "key": what the index was built from; "words": the indexed names; "variants": deletion -> names;
+# "named": the aliases and builtins; "building": the thread building a new index, or None
+_index = {"key": None, "words": frozenset(), "variants": {}, "named": frozenset(), "building": None}
+# Command -> uses in readline's history, and how many history items have been counted
+_history = {"length": 0, "counts": {}}
+_lock = threading.Lock()
+
+def distance(a, b, limit):
+    """
+    Edit distance between `a` and `b` where swapping two neighbouring characters is one edit
+    (optimal string alignment), giving up with limit + 1 once it gets larger than `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+def deletes(word, depth):
+    """Return `word` and every string made by deleting up to `depth` of its characters."""
+    found = {word}
+    current = {word}
+    for _ in range(depth):
+        current = {w[:i] + w[i + 1:] for w in current for i in range(len(w))}
+        found |= current
+    return found
+
+def build(words, depth=MAX_EDITS):
+    """Return the index over `words`: every variant from deletes() -> the words it comes from."""
+    variants = {}
+    for word in words:
+        for variant in deletes(word, depth):
+            variants.setdefault(variant, []).append(word)
+    return variants
+
+def search(variants, word, limit):
+    """Return (distance, name) for every indexed name within `limit` edits of `word`."""
+    # Two strings within `limit` edits of each other share a string with at most `limit` deletions from each
+    names = set()
+    for variant in deletes(word, limit):
+        names.update(variants.get(variant, ()))
+    found = []
+    for name in names:
+        d = distance(word, name, limit)
+        if d <= limit:
+            found.append((d, name))
+    return found
+
+def _history_counts():
+    """
+    Return command -> uses in readline's history, counting only the items added since the last call.
+    Main thread only: GNU history is not thread safe, so the build thread gets a snapshot.
+    """
+    length = readline.get_current_history_length()
+    if length < _history["length"]:
+        # Items were removed (see history_db.main); count again
+        _history.update(length=0, counts={})
+    counts = _history["counts"]
+    for i in range(_history["length"] + 1, length + 1):
+        line = readline.get_history_item(i)
+        if line and line.split():
+            command = line.split()[0]
+            counts[command] = counts.get(command, 0) + 1
+    _history["length"] = length
+    return counts
+
+def _frequent():
+    return frozenset(command for command, n in _history_counts().items() if n >= HISTORY_MIN)
+
+def _key(aliases, builtins, frequent):
+    return (completion._path_key(), tuple(sorted(aliases)), tuple(builtins), frequent)
+
+def _build(aliases, frequent):
+    try:
+        builtins = builtin_registry.names()
+        key = _key(aliases, builtins, frequent)
+        named = frozenset(aliases) | frozenset(builtins)
+        words = frozenset(completion.path_executables() | named | frequent)
+        variants = _index["variants"] if words == _index["words"] else build(words)
+        with _lock:
+            _index.update(key=key, words=words, variants=variants, named=named)
+    finally:
+        with _lock:
+            _index["building"] = None
+
+def _rebuild(aliases, frequent):
+    """
+    Start building the index on a daemon thread, unless a build is running; return the thread.
+    The aliases and history commands are passed in: loading aliases runs aliases.py and reading
+    readline's history is not thread safe, so only the main thread does either.
+    """
+    with _lock:
+        thread = _index["building"]
+        if thread is None:
+            thread = _index["building"] = threading.Thread(target=_build, args=(aliases, frequent), daemon=True, name="typo")
+            thread.start()
+        return thread
+
+def index():
+    """
+    Return the index and the alias and builtin names. When the sources changed the current index is
+    still used while a new one is built in the background, so a lookup never waits for a rebuild; only
+    a search before the first build is done waits for it.
+    """
+    aliases = config_manager.aliases()
+    frequent = _frequent()
+    if _index["key"] != _key(aliases, builtin_registry.names(), frequent):
+        thread = _rebuild(aliases, frequent)
+        if _index["key"] is None:
+            thread.join()
+    with _lock:
+        return _index["variants"], _index["named"]
+
+def start():
+    """Build the index on a daemon thread, so the first correction is instant."""
+    _rebuild(config_manager.aliases(), _frequent())
+
+def _runnable(word):
+    return (
+        word in builtin_registry.names() or word in config_manager.aliases()
+        or word in direct_exec.BASH_BUILTINS or direct_exec.which(word) is not None
+    )
+
+def correct_command(command):
+    """
+    Return the name `command` was most likely meant to be, or None when no name is clearly best.
+
+    Names one edit away are searched for short commands and two for longer ones. The closest name wins;
+    among equally close ones the most used wins, and a tie means there is no confident answer.
+    """
+    if not command or "/" in command:
+        return None
+    variants, named = index()
+    counts = _history["counts"]
+    limit = 1 if len(command) <= 4 else 2
+    # History counts rank the candidates; aliases and builtins count as used once more
+    candidates = [(d, -(counts.get(name, 0) + (name in named)), name) for d, name in search(variants, command, limit) if d > 0]
+    candidates = sorted(c for c in candidates if _runnable(c[2]))
+    if not candidates:
+        return None
+    if len(candidates) > 1 and candidates[0][:2] == candidates[1][:2]:
+        return None
+    return candidates[0][2]
+
+def correct(line):
+    """Return `line` with its mistyped command corrected, or None."""
+    command, sep, rest = line.strip().partition(" ")
+    corrected = correct_command(command)
+    if corrected is None:
+        return None
+    return corrected + sep + rest
+
+def benchmark(words=("gti", "pacamn", "pyhton3", "sl", "grpe"), count=200):
+    """Print how long a correction takes once the index is built."""
+    index()
+    for word in words:
+        start_time = time.perf_counter()
+        for _ in range(count):
+            result = correct_command(word)
+        elapsed = (time.perf_counter() - start_time) / count
+        print(f"{word} -> {result}: {elapsed * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    benchmark()